@@ -7,6 +7,7 @@ from airport.models import (
     Airplane,
     Crew,
     Flight,
+    FlightSchedule,
     Order,
     Ticket,
 )
@@ -18,5 +19,6 @@ admin.site.register(AirplaneType)
 admin.site.register(Airplane)
 admin.site.register(Crew)
 admin.site.register(Flight)
+admin.site.register(FlightSchedule)
 admin.site.register(Order)
 admin.site.register(Ticket)
@@ -0,0 +1,191 @@
+"""
+Async-native read endpoints for flights.
+
+DRF views are sync only, so under ASGI every request to FlightViewSet is
+handed to a worker thread. These views run on the event loop and use
+the async ORM instead. Each flight is rendered as by the FlightViewSet
+list and retrieve actions, but the list has its own contract: a
+{"results": [...], "next": url} object paged by ?after=<last flight id>,
+with no previous link, and neither view sends ETag or Last-Modified or
+answers conditional requests. The list is streamed one flight at a time
+while rows arrive from aiterator().
+"""
+
+import math
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch, Q, Subquery
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import (
+    APIException,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+    Throttled,
+    ValidationError,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from airport.models import Crew, Flight
+from airport.pagination import FlightPagination
+from airport.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport.serializers import FlightDetailSerializer, FlightListSerializer
+from airport.views import FlightViewSet
+from airport_api.throttling import FlightListThrottle
+
+renderer = JSONRenderer()
+
+
+def check_permissions(request, throttles=()):
+    """Authenticate with the DRF authentication classes and apply the
+    FlightViewSet permission and throttles. Runs in a thread, the user
+    lookup is sync."""
+    drf_request = Request(
+        request,
+        authenticators=[
+            authentication()
+            for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+    if not IsAdminOrIfAuthenticatedReadOnly().has_permission(
+        drf_request, None
+    ):
+        if (
+            drf_request.authenticators
+            and not drf_request.successful_authenticator
+        ):
+            raise NotAuthenticated()
+        raise PermissionDenied()
+    for throttle in throttles:
+        if not throttle.allow_request(drf_request, None):
+            raise Throttled(throttle.wait())
+    return drf_request
+
+
+def error_response(request, exc):
+    data = exc.detail
+    if not isinstance(data, (dict, list)):
+        data = {"detail": data}
+    response = HttpResponse(
+        renderer.render(data),
+        status=exc.status_code,
+        content_type="application/json",
+    )
+    if isinstance(exc, Throttled) and exc.wait is not None:
+        response["Retry-After"] = str(math.ceil(exc.wait))
+    if isinstance(exc, NotAuthenticated):
+        authenticator = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+        response["WWW-Authenticate"] = authenticator.authenticate_header(
+            request
+        )
+    return response
+
+
+def flight_queryset():
+    return FlightViewSet.annotate_tickets_available(
+        Flight.objects.select_related(
+            "route__source", "route__destination", "airplane"
+        ).prefetch_related(
+            Prefetch("crew", queryset=Crew.objects.order_by("id"))
+        )
+    )
+
+
+def page_size(params):
+    try:
+        size = int(params.get(FlightPagination.page_size_query_param, ""))
+    except ValueError:
+        return FlightPagination.page_size
+    if size < 1:
+        return FlightPagination.page_size
+    return min(size, FlightPagination.max_page_size)
+
+
+def after_flight(queryset, after):
+    """Keyset continuation after the flight with id `after` in
+    (departure_time, id) order"""
+    try:
+        after = int(after)
+    except ValueError:
+        raise ValidationError({"after": "Expected a flight id"})
+    anchor = Subquery(
+        Flight.objects.filter(id=after).values("departure_time")
+    )
+    return queryset.filter(
+        Q(departure_time__gt=anchor) | Q(departure_time=anchor, id__gt=after)
+    )
+
+
+async def stream_flights(request, queryset, size):
+    """JSON page of flights, written while rows are read. The next link
+    is known only after the last row, so it closes the object."""
+    # One serializer for the page, so its fields are built only once
+    serializer = FlightListSerializer(context={"request": request})
+    count = 0
+    last_id = None
+    has_next = False
+    yield b'{"results":['
+    async for flight in queryset[:size + 1].aiterator(chunk_size=size + 1):
+        if count == size:
+            has_next = True
+            break
+        if count:
+            yield b","
+        yield renderer.render(serializer.to_representation(flight))
+        last_id = flight.id
+        count += 1
+    next_url = b"null"
+    if has_next:
+        params = request.GET.copy()
+        params["after"] = last_id
+        next_url = renderer.render(
+            request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+        )
+    yield b'],"next":' + next_url + b"}"
+
+
+@require_GET
+async def flight_list(request):
+    """GET flights in departure order with the FlightViewSet filters,
+    page_size and ?after=<last flight id of the previous page>"""
+    try:
+        drf_request = await sync_to_async(check_permissions)(
+            request, [FlightListThrottle()]
+        )
+        params = drf_request.query_params
+        queryset = FlightViewSet.filter_flights(flight_queryset(), params)
+        if params.get("after"):
+            queryset = after_flight(queryset, params["after"])
+    except APIException as exc:
+        return error_response(request, exc)
+
+    return StreamingHttpResponse(
+        stream_flights(
+            request,
+            queryset.order_by(*FlightPagination.ordering),
+            page_size(params),
+        ),
+        content_type="application/json",
+    )
+
+
+@require_GET
+async def flight_detail(request, pk):
+    try:
+        await sync_to_async(check_permissions)(request)
+        try:
+            flight = await flight_queryset().aget(pk=pk)
+        except Flight.DoesNotExist:
+            raise NotFound("No Flight matches the given query.")
+    except APIException as exc:
+        return error_response(request, exc)
+
+    return HttpResponse(
+        renderer.render(
+            FlightDetailSerializer(flight, context={"request": request}).data
+        ),
+        content_type="application/json",
+    )
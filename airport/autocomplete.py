@@ -0,0 +1,215 @@
+"""
+Airport autocomplete by name and closest big city.
+
+On PostgreSQL the search runs against pg_trgm GIN indexes on
+UPPER(name) and UPPER(closest_big_city) from migration 0003. They
+serve the prefix, word prefix and word similarity conditions together.
+Other databases use AirportTrie, an in-memory prefix trie with a trigram
+index for typos. It is rebuilt when the Airport cache generation
+changes.
+
+Both rank the same way: name prefix, then word or city prefix, then
+similarity, then name.
+"""
+
+import re
+import threading
+from collections import Counter
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+from airport.cache import get_model_versions
+from airport.models import Airport
+
+AUTOCOMPLETE_MAX_LIMIT = 50
+# Same default as pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+MIN_FUZZY_LENGTH = 3
+# Prefixes up to this length have their best matches precomputed
+TRIE_DEPTH = 4
+
+NAME_PREFIX, WORD_PREFIX, SIMILAR = range(3)
+
+
+def words(text):
+    return re.findall(r"\w+", text.casefold())
+
+
+def trigrams(word):
+    """pg_trgm style trigrams of one word"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AirportTrie:
+    """In-memory prefix trie over airport names and cities.
+
+    Keys are inserted best first. Every node down to TRIE_DEPTH keeps the
+    first AUTOCOMPLETE_MAX_LIMIT airports that reach it as (rank, name,
+    id), and the deepest nodes keep their longer keys in the same order
+    for a scan that stops at the limit. Misses fall back to a trigram
+    index over the distinct words of both fields.
+    """
+
+    def __init__(self):
+        self.root = [{}, [], [], []]
+        self.airports = {}
+        self.words = []
+        self.postings = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def current_version(self):
+        return get_model_versions([Airport])[0]
+
+    def rebuild(self):
+        airports, keys, word_ids = {}, [], {}
+        for pk, name, city in Airport.objects.values_list(
+            "id", "name", "closest_big_city"
+        ):
+            airports[pk] = (name, city)
+            sort_name = name.casefold()
+            ranks = {sort_name: NAME_PREFIX}
+            for key in [city.casefold(), *words(name), *words(city)]:
+                ranks.setdefault(key, WORD_PREFIX)
+            keys.extend(
+                (rank, sort_name, pk, key) for key, rank in ranks.items()
+            )
+            for word in {*words(name), *words(city)}:
+                word_ids.setdefault(word, []).append(pk)
+
+        # Nodes are [children, best entries, their ids, bucket]
+        root = [{}, [], [], []]
+        keys.sort()
+        for rank, sort_name, pk, key in keys:
+            node = root
+            for char in key[:TRIE_DEPTH]:
+                child = node[0].get(char)
+                if child is None:
+                    child = node[0][char] = [{}, [], [], []]
+                node = child
+                if len(node[2]) < AUTOCOMPLETE_MAX_LIMIT and pk not in node[2]:
+                    node[2].append(pk)
+                    node[1].append((rank, sort_name, pk))
+            if len(key) > TRIE_DEPTH:
+                node[3].append((key, (rank, sort_name, pk)))
+
+        indexed_words, postings = [], {}
+        for index, (word, pks) in enumerate(word_ids.items()):
+            grams = trigrams(word)
+            indexed_words.append((len(grams), pks))
+            for gram in grams:
+                postings.setdefault(gram, []).append(index)
+
+        with self.lock:
+            self.root, self.airports = root, airports
+            self.words, self.postings = indexed_words, postings
+            self.version = self.current_version()
+
+    def ensure_current(self):
+        if self.version is None or self.version != self.current_version():
+            self.rebuild()
+
+    def prefix_matches(self, query, limit):
+        """Best (rank, name, id) of the airports with a key starting with
+        query. Past TRIE_DEPTH the node's keys are scanned best first."""
+        query = query.casefold()
+        node = self.root
+        for char in query[:TRIE_DEPTH]:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        if len(query) <= TRIE_DEPTH:
+            return node[1]
+        matches = {}
+        for key, entry in node[3]:
+            if key.startswith(query):
+                matches.setdefault(entry[2], entry)
+                if len(matches) == limit:
+                    break
+        return list(matches.values())
+
+    def similar(self, query):
+        """{id: similarity} of airports with a word similar to query"""
+        query_grams = trigrams(query.casefold())
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+        scores = {}
+        for index, count in shared.items():
+            gram_count, pks = self.words[index]
+            score = count / (len(query_grams) + gram_count - count)
+            if score >= SIMILARITY_THRESHOLD:
+                for pk in pks:
+                    scores[pk] = max(scores.get(pk, 0), score)
+        return scores
+
+    def search(self, query, limit):
+        """[(id, name, closest_big_city)] best first"""
+        self.ensure_current()
+        ranked = {
+            pk: (rank, 0, name, pk)
+            for rank, name, pk in self.prefix_matches(query, limit)
+        }
+        if len(ranked) < limit and len(query) >= MIN_FUZZY_LENGTH:
+            for pk, score in self.similar(query).items():
+                ranked.setdefault(
+                    pk, (SIMILAR, -score, self.airports[pk][0].casefold(), pk)
+                )
+        return [
+            (pk, *self.airports[pk])
+            for *_, pk in sorted(ranked.values())[:limit]
+        ]
+
+
+airport_trie = AirportTrie()
+
+
+def search_postgres(query, limit):
+    upper = query.upper()
+    name, city = Upper("name"), Upper("closest_big_city")
+    queryset = (
+        Airport.objects.alias(name_upper=name, city_upper=city)
+        .filter(
+            Q(name_upper__startswith=upper)
+            | Q(name_upper__contains=f" {upper}")
+            | Q(city_upper__startswith=upper)
+            | Q(city_upper__contains=f" {upper}")
+            | Q(name_upper__trigram_word_similar=upper)
+            | Q(city_upper__trigram_word_similar=upper)
+        )
+        .annotate(
+            rank=Case(
+                When(name_upper__startswith=upper, then=Value(NAME_PREFIX)),
+                When(
+                    Q(name_upper__contains=f" {upper}")
+                    | Q(city_upper__startswith=upper)
+                    | Q(city_upper__contains=f" {upper}"),
+                    then=Value(WORD_PREFIX),
+                ),
+                default=Value(SIMILAR),
+                output_field=IntegerField(),
+            ),
+            similarity=Greatest(
+                TrigramWordSimilarity(upper, name),
+                TrigramWordSimilarity(upper, city),
+            ),
+        )
+        .order_by("rank", "-similarity", "name_upper", "id")
+    )
+    return list(
+        queryset.values_list("id", "name", "closest_big_city")[:limit]
+    )
+
+
+def search_airports(query, limit):
+    """Up to limit (id, name, closest_big_city) matching query"""
+    query = query.strip()
+    if not query:
+        return []
+    if connection.vendor == "postgresql":
+        return search_postgres(query, limit)
+    return airport_trie.search(query, limit)
@@ -0,0 +1,48 @@
+"""
+Throwaway databases for the bench_* management commands.
+
+Each benchmark seeds and measures a test database created for the run
+and destroyed afterwards, unless it is given --use-existing-db.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection, connections
+
+USE_EXISTING_DB_HELP = (
+    "Seed and benchmark the configured database instead of a throwaway "
+    "test database"
+)
+
+
+def add_use_existing_db_argument(parser, help=USE_EXISTING_DB_HELP):
+    parser.add_argument("--use-existing-db", action="store_true", help=help)
+
+
+@contextmanager
+def benchmark_database(use_existing_db, sqlite_name=None):
+    """Run the block against a new test database, or against the
+    configured one when use_existing_db is set.
+
+    On SQLite the test database is in memory unless sqlite_name names a
+    file in the temp directory, which benchmarks writing from several
+    threads need to wait for each other's locks instead of failing.
+    """
+    if use_existing_db:
+        yield
+        return
+    old_name = connection.settings_dict["NAME"]
+    if sqlite_name and connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            tempfile.gettempdir(), sqlite_name
+        )
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,49 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY_PREFIX = "reference-data:version"
+LIST_KEY_PREFIX = "reference-data:list"
+
+
+def model_version_key(model):
+    return f"{VERSION_KEY_PREFIX}:{model._meta.label_lower}"
+
+
+def get_model_versions(models):
+    """Current cache generation of each model, created on first use.
+
+    Generations start from a timestamp rather than zero so that an evicted
+    counter can never line up with list entries cached before the eviction.
+    """
+    keys = [model_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model):
+    key = model_version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def list_cache_key(request, models):
+    versions = ":".join(str(version) for version in get_model_versions(models))
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"{LIST_KEY_PREFIX}:{url}:{versions}"
+
+
+def get_cached_list(key):
+    return cache.get(key)
+
+
+def set_cached_list(key, data):
+    cache.set(key, data, settings.REFERENCE_DATA_CACHE_TIMEOUT)
@@ -0,0 +1,70 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from airport.models import Flight
+
+# Everything rendered by FlightListSerializer/FlightDetailSerializer.
+# Lists aggregate over the flights of the requested page only, so the
+# check costs the same whatever the number of matching flights.
+# Ticket writes and crew assignment touch Flight.updated_at, which keeps
+# tickets_available and the crew list covered without joining tickets.
+FLIGHT_STATE = {
+    "flights": Count("id", distinct=True),
+    "flight_updated_at": Max("updated_at"),
+    "route_updated_at": Max("route__updated_at"),
+    "source_updated_at": Max("route__source__updated_at"),
+    "destination_updated_at": Max("route__destination__updated_at"),
+    "airplane_updated_at": Max("airplane__updated_at"),
+    "crew_updated_at": Max("crew__updated_at"),
+}
+
+
+def flight_validators(request, queryset, page=()):
+    """ETag and Last-Modified timestamp of the flights in queryset.
+
+    page lists what else the response depends on, such as the ids and
+    neighbours of a list page, so that removing a flight changes the
+    ETag even though no remaining timestamp moves.
+    """
+    state = queryset.order_by().aggregate(**FLIGHT_STATE)
+    if not state["flights"]:
+        return None, None
+
+    last_modified = max(
+        value for key, value in state.items()
+        if value is not None and key != "flights"
+    )
+    fingerprint = "|".join(
+        [
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            *(f"{key}={state[key]}" for key in FLIGHT_STATE),
+            *map(str, page),
+        ]
+    )
+    etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+    return etag, int(last_modified.timestamp())
+
+
+def flight_page_validators(request, flights, paginator, view):
+    """ETag of one list page, computed over the flights of that page only.
+    There is no Last-Modified: a deleted flight moves no timestamp, and
+    an If-Modified-Since check would answer 304 with the stale page."""
+    page = paginator.paginate_queryset(
+        flights.values("id", *paginator.ordering), request, view=view
+    )
+    ids = [row["id"] for row in page]
+    etag, _ = flight_validators(
+        request,
+        Flight.objects.filter(id__in=ids),
+        page=[ids, paginator.has_next, paginator.has_previous],
+    )
+    return etag, None
+
+
+def touch_flights(flight_ids):
+    """Mark flights as modified when their tickets or crew change"""
+    Flight.objects.filter(id__in=flight_ids).update(updated_at=timezone.now())
@@ -0,0 +1,166 @@
+"""
+Double-booking of airplanes and crew members.
+
+A flight holds its airplane and crew from departure_time up to, but not
+including, arrival_time. check_assignment rejects a flight overlapping
+another flight of the same airplane or crew member. It locks those rows
+first, so concurrent bookings of the same airplane or crew member queue
+instead of both passing the check. On PostgreSQL the airplane check is
+served by a GiST index over (airplane_id, flight_period()) from
+migration 0004.
+
+find_conflicts reports every overlapping pair of a whole schedule in one
+sweep over the flights sorted by departure, O(n log n + k) for k pairs.
+"""
+
+import heapq
+from collections import defaultdict
+
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.db import connection
+from django.db.models import F, Func
+from django.db.models.functions import Greatest
+from rest_framework.exceptions import ValidationError
+
+from airport.models import Airplane, Crew, Flight
+
+
+class TsTzRange(Func):
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
+
+def flight_period():
+    """tstzrange of a flight. Rows whose arrival is not after departure
+    get an empty range instead of a range error."""
+    return TsTzRange(
+        "departure_time", Greatest("arrival_time", F("departure_time"))
+    )
+
+
+def overlapping(flights, departure_time, arrival_time):
+    """Flights of a queryset in the air at some point between
+    departure_time and arrival_time"""
+    if connection.vendor == "postgresql":
+        return flights.alias(period=flight_period()).filter(
+            period__overlap=(departure_time, arrival_time)
+        )
+    return flights.filter(
+        departure_time__lt=arrival_time, arrival_time__gt=departure_time
+    )
+
+
+def lock_resources(airplane_id, crew_ids):
+    """Hold the airplane and crew rows until the end of the transaction"""
+    list(
+        Airplane.objects.select_for_update()
+        .filter(pk=airplane_id)
+        .values_list("id", flat=True)
+    )
+    list(
+        Crew.objects.select_for_update()
+        .filter(pk__in=crew_ids)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def check_assignment(
+    airplane_id, crew_ids, departure_time, arrival_time, flight_id=None
+):
+    """Raise ValidationError if the airplane or a crew member is on
+    another flight in the time span. Call it in a transaction."""
+    crew_ids = sorted(set(crew_ids))
+    lock_resources(airplane_id, crew_ids)
+    others = overlapping(
+        Flight.objects.exclude(pk=flight_id), departure_time, arrival_time
+    )
+
+    errors = {}
+    airplane_flights = list(
+        others.filter(airplane_id=airplane_id)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    if airplane_flights:
+        errors["airplane"] = [
+            "Airplane is already assigned to flights "
+            f"{', '.join(map(str, airplane_flights))} at that time."
+        ]
+    if crew_ids:
+        busy = defaultdict(list)
+        for crew_id, other_id in (
+            Flight.crew.through.objects.filter(
+                crew_id__in=crew_ids, flight__in=others
+            )
+            .order_by("crew_id", "flight_id")
+            .values_list("crew_id", "flight_id")
+        ):
+            busy[crew_id].append(other_id)
+        if busy:
+            errors["crew"] = [
+                f"Crew member {crew_id} is already assigned to flights "
+                f"{', '.join(map(str, flight_ids))} at that time."
+                for crew_id, flight_ids in busy.items()
+            ]
+    if errors:
+        raise ValidationError(errors)
+
+
+def find_conflicts(intervals):
+    """Overlapping pairs of (resource, flight_id, start, end) intervals
+    of the same resource, as (resource, flight_id, other_id,
+    overlap_start, overlap_end) with flight_id departing first"""
+    # Flights of each resource still in the air, by arrival
+    active = defaultdict(list)
+    for resource, flight_id, start, end in sorted(
+        intervals, key=lambda interval: (interval[2], interval[1])
+    ):
+        airborne = active[resource]
+        while airborne and airborne[0][0] <= start:
+            heapq.heappop(airborne)
+        for other_end, other_id in sorted(airborne, key=lambda x: x[1]):
+            yield resource, other_id, flight_id, start, min(end, other_end)
+        heapq.heappush(airborne, (end, flight_id))
+
+
+def conflict_report(start=None, end=None):
+    """Every airplane and crew double-booking among the flights in the
+    air between start and end (all flights when not given)"""
+    flights = Flight.objects.all()
+    if start:
+        flights = flights.filter(arrival_time__gt=start)
+    if end:
+        flights = flights.filter(departure_time__lt=end)
+
+    intervals = [
+        (("airplane", airplane_id), flight_id, departure, arrival)
+        for flight_id, airplane_id, departure, arrival in flights.values_list(
+            "id", "airplane_id", "departure_time", "arrival_time"
+        ).iterator()
+    ]
+    intervals.extend(
+        (("crew", crew_id), flight_id, departure, arrival)
+        for flight_id, crew_id, departure, arrival in (
+            Flight.crew.through.objects.filter(flight__in=flights)
+            .values_list(
+                "flight_id",
+                "crew_id",
+                "flight__departure_time",
+                "flight__arrival_time",
+            )
+            .iterator()
+        )
+    )
+    return [
+        {
+            "resource": resource[0],
+            "resource_id": resource[1],
+            "flight": flight_id,
+            "conflicting_flight": other_id,
+            "overlap_start": overlap_start,
+            "overlap_end": overlap_end,
+        }
+        for resource, flight_id, other_id, overlap_start, overlap_end
+        in find_conflicts(intervals)
+    ]
@@ -0,0 +1,14 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+
+class SeatReservedError(ValidationError):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This seat already reserved"
+    default_code = "seat_reserved"
+
+
+class SeatBusyError(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "These seats are being booked, try again"
+    default_code = "seat_busy"
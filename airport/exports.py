@@ -0,0 +1,101 @@
+"""
+Streaming CSV and NDJSON exports.
+
+Rows are read with values_list().iterator(), so only one chunk of rows is
+held in memory at a time. Each row is encoded and sent straight away,
+whatever the size of the export.
+"""
+
+import csv
+import json
+from datetime import date, datetime
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+TICKET_EXPORT_COLUMNS = {
+    "id": "id",
+    "order": "order_id",
+    "ordered_at": "order__created_at",
+    "user": "order__user__email",
+    "flight": "flight_id",
+    "source": "flight__route__source__name",
+    "destination": "flight__route__destination__name",
+    "departure_time": "flight__departure_time",
+    "row": "row",
+    "seat": "seat",
+}
+ORDER_EXPORT_COLUMNS = {
+    "id": "id",
+    "created_at": "created_at",
+    "user": "user__email",
+    "tickets": "ticket_count",
+}
+MANIFEST_COLUMNS = {
+    "row": "row",
+    "seat": "seat",
+    "ticket": "id",
+    "order": "order_id",
+    "passenger": "order__user__email",
+    "ordered_at": "order__created_at",
+}
+
+
+class Echo:
+    """File-like object that returns what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def plain_values(rows):
+    for row in rows:
+        yield [
+            value.isoformat() if isinstance(value, (date, datetime))
+            else value
+            for value in row
+        ]
+
+
+def csv_lines(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in plain_values(rows):
+        yield writer.writerow(row)
+
+
+def ndjson_lines(headers, rows):
+    for row in plain_values(rows):
+        yield json.dumps(dict(zip(headers, row))) + "\n"
+
+
+def export_format(request):
+    output = request.query_params.get("output", "csv")
+    if output not in EXPORT_FORMATS:
+        raise ValidationError(
+            {"output": f"Expected one of: {', '.join(EXPORT_FORMATS)}"}
+        )
+    return output
+
+
+def export_response(request, queryset, columns, filename):
+    """Stream queryset as CSV (default) or, with ?output=ndjson, as
+    newline-delimited JSON. columns maps headers to field lookups."""
+    output = export_format(request)
+    rows = queryset.values_list(*columns.values()).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    lines = csv_lines if output == "csv" else ndjson_lines
+    response = StreamingHttpResponse(
+        lines(list(columns), rows), content_type=EXPORT_FORMATS[output]
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{output}"'
+    )
+    return response
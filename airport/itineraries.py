@@ -0,0 +1,96 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+
+from airport.models import Flight
+from airport.route_graph import route_graph
+
+
+def search_itineraries(
+    source_id,
+    destination_id,
+    departure_from,
+    departure_to,
+    max_stops,
+    ordering,
+    limit,
+):
+    """Connecting journeys from source to destination airport.
+
+    Candidate route paths come from the in-memory route graph, the flights
+    of every route on those paths are loaded with a single query, and each
+    first-leg flight departing in [departure_from, departure_to) is chained
+    to the earliest connection that respects the minimum connection time.
+    """
+    paths = list(
+        route_graph.paths(
+            source_id,
+            destination_id,
+            max_legs=max_stops + 1,
+            limit=settings.ITINERARY_MAX_PATHS,
+        )
+    )
+    if not paths:
+        return []
+
+    min_connection = settings.ITINERARY_MIN_CONNECTION
+    max_connection = settings.ITINERARY_MAX_CONNECTION
+    window_end = departure_to + max_stops * (
+        max_connection + timedelta(days=1)
+    )
+
+    legs = defaultdict(list)
+    flights = (
+        Flight.objects.filter(
+            route_id__in={route_id for _, path in paths for route_id in path},
+            departure_time__gte=departure_from,
+            departure_time__lt=window_end,
+        )
+        .order_by("departure_time")
+        .values_list("id", "route_id", "departure_time", "arrival_time")
+    )
+    for flight_id, route_id, departure_time, arrival_time in flights:
+        legs[route_id].append((departure_time, arrival_time, flight_id))
+    departures = {
+        route_id: [departure_time for departure_time, _, _ in route_legs]
+        for route_id, route_legs in legs.items()
+    }
+
+    itineraries = []
+    for distance, path in paths:
+        for first_leg in legs.get(path[0], []):
+            if first_leg[0] >= departure_to:
+                break
+            chain = [first_leg]
+            for route_id in path[1:]:
+                arrival_time = chain[-1][1]
+                route_legs = legs.get(route_id, [])
+                index = bisect_left(
+                    departures.get(route_id, []), arrival_time + min_connection
+                )
+                if (
+                    index == len(route_legs)
+                    or route_legs[index][0] > arrival_time + max_connection
+                ):
+                    chain = None
+                    break
+                chain.append(route_legs[index])
+            if chain:
+                itineraries.append(
+                    {
+                        "stops": len(chain) - 1,
+                        "distance": distance,
+                        "departure_time": chain[0][0],
+                        "arrival_time": chain[-1][1],
+                        "duration": chain[-1][1] - chain[0][0],
+                        "flight_ids": [flight_id for _, _, flight_id in chain],
+                    }
+                )
+
+    if ordering == "duration":
+        itineraries.sort(key=lambda item: (item["duration"], item["distance"]))
+    else:
+        itineraries.sort(key=lambda item: (item["distance"], item["duration"]))
+    return itineraries[:limit]
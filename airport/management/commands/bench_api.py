@@ -0,0 +1,287 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from airport import urls as airport_urls
+from airport.benchmarking import (
+    add_use_existing_db_argument,
+    benchmark_database,
+)
+from airport.models import Flight, FlightSchedule
+from airport.seeding import SEED_PASSWORD, seed_data
+from user import urls as user_urls
+
+
+def url_names(patterns, namespace):
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= url_names(pattern.url_patterns, namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f"{namespace}:{pattern.name}")
+    return names
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    """Measure latency, query count and payload size of every API route"""
+
+    help = (
+        "Seed a throwaway test database to the given scale, request every "
+        "route of airport/urls.py and user/urls.py through the DRF test "
+        "client and print p50/p95 latency, SQL queries and response bytes "
+        "as JSON. Fails if a route has no scenario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=50)
+        parser.add_argument("--flights", type=int, default=1000)
+        parser.add_argument("--tickets-per-flight", type=int, default=20)
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", help="Write the JSON report to this file"
+        )
+        add_use_existing_db_argument(parser)
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_existing_db"]):
+            # Throttling would turn most iterations into 429s
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_RATES": {},
+                },
+            ):
+                report = self.run(options)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output + "\n")
+        self.stdout.write(output)
+
+    def run(self, options):
+        seeded = seed_data(
+            airports=options["airports"],
+            flights=options["flights"],
+            tickets_per_flight=options["tickets_per_flight"],
+            seed=options["seed"],
+        )
+        user = get_user_model().objects.filter(order__isnull=False).first()
+        # staff, so the admin-only exports are measured too
+        user.is_staff = True
+        user.save(update_fields=["is_staff"])
+        client = APIClient()
+        tokens = client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": user.email, "password": SEED_PASSWORD},
+        ).data
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {tokens['access']}"}
+
+        flight = Flight.objects.select_related(
+            "route__source", "route__destination", "airplane"
+        ).order_by("id").first()
+        route = flight.route
+        order = user.order_set.order_by("id").first()
+        departure = timezone.now() + timedelta(days=400)
+        timetable = (
+            "source,destination,airplane,departure_time,arrival_time\n"
+            f"{route.source.name},{route.destination.name},"
+            f"{flight.airplane.name},{departure.isoformat()},"
+            f"{(departure + timedelta(hours=2)).isoformat()}\n"
+        ).encode()
+        registrations = iter(range(10**9))
+        schedule = FlightSchedule.objects.create(
+            route=route,
+            airplane=flight.airplane,
+            days_of_week=0b1111111,
+            departure_time=departure.time(),
+            block_time=timedelta(hours=2),
+            valid_from=departure.date() + timedelta(days=1),
+            valid_to=departure.date() + timedelta(days=30),
+        )
+
+        scenarios = {
+            "airport:api-root": ("get", reverse("airport:api-root"), {}),
+            "airport:airport-list": (
+                "get", reverse("airport:airport-list"), {}
+            ),
+            "airport:airport-autocomplete": (
+                "get",
+                reverse("airport:airport-autocomplete"),
+                lambda: {"q": route.source.name[:3]},
+            ),
+            "airport:airplane-list": (
+                "get", reverse("airport:airplane-list"), {}
+            ),
+            "airport:airplanetype-list": (
+                "get", reverse("airport:airplanetype-list"), {}
+            ),
+            "airport:route-list": ("get", reverse("airport:route-list"), {}),
+            "airport:crew-list": ("get", reverse("airport:crew-list"), {}),
+            "airport:flight-list": (
+                "get", reverse("airport:flight-list"), {}
+            ),
+            "airport:flight-detail": (
+                "get", reverse("airport:flight-detail", args=[flight.id]), {}
+            ),
+            "airport:async-flight-list": (
+                "get", reverse("airport:async-flight-list"), {}
+            ),
+            "airport:async-flight-detail": (
+                "get",
+                reverse("airport:async-flight-detail", args=[flight.id]),
+                {},
+            ),
+            "airport:flightsearchrow-list": (
+                "get", reverse("airport:flightsearchrow-list"), {}
+            ),
+            "airport:flight-seats": (
+                "get", reverse("airport:flight-seats", args=[flight.id]), {}
+            ),
+            "airport:flight-import-schedule": (
+                "post",
+                reverse("airport:flight-import-schedule"),
+                lambda: {
+                    "file": SimpleUploadedFile("timetable.csv", timetable)
+                },
+            ),
+            "airport:flight-manifest": (
+                "get",
+                reverse("airport:flight-manifest", args=[flight.id]),
+                {},
+            ),
+            "airport:flight-conflicts": (
+                "get",
+                reverse("airport:flight-conflicts"),
+                lambda: {
+                    "start": flight.departure_time.isoformat(),
+                    "end": (
+                        flight.departure_time + timedelta(days=7)
+                    ).isoformat(),
+                },
+            ),
+            "airport:flightschedule-list": (
+                "get", reverse("airport:flightschedule-list"), {}
+            ),
+            "airport:flightschedule-detail": (
+                "get",
+                reverse("airport:flightschedule-detail", args=[schedule.id]),
+                {},
+            ),
+            "airport:flightschedule-materialize": (
+                "post",
+                reverse("airport:flightschedule-materialize"),
+                {"until": schedule.valid_to.isoformat()},
+            ),
+            "airport:flight-itineraries": (
+                "get",
+                reverse("airport:flight-itineraries"),
+                lambda: {
+                    "source": route.source_id,
+                    "destination": route.destination_id,
+                    "departure_date": flight.departure_time.date(),
+                },
+            ),
+            "airport:order-list": ("get", reverse("airport:order-list"), {}),
+            "airport:order-detail": (
+                "get", reverse("airport:order-detail", args=[order.id]), {}
+            ),
+            "airport:order-export": (
+                "get", reverse("airport:order-export"), {}
+            ),
+            "airport:ticket-list": (
+                "get", reverse("airport:ticket-list"), {}
+            ),
+            "airport:ticket-export": (
+                "get", reverse("airport:ticket-export"), {}
+            ),
+            "user:create": (
+                "post",
+                reverse("user:create"),
+                lambda: {
+                    "email": f"bench{next(registrations)}@example.com",
+                    "password": "bench-password",
+                },
+            ),
+            "user:token_obtain_pair": (
+                "post",
+                reverse("user:token_obtain_pair"),
+                {"email": user.email, "password": SEED_PASSWORD},
+            ),
+            "user:token_refresh": (
+                "post",
+                reverse("user:token_refresh"),
+                {"refresh": tokens["refresh"]},
+            ),
+            "user:token_verify": (
+                "post",
+                reverse("user:token_verify"),
+                {"token": tokens["access"]},
+            ),
+            "user:manage": ("get", reverse("user:manage"), {}),
+        }
+
+        registered = url_names(
+            airport_urls.urlpatterns, "airport"
+        ) | url_names(user_urls.urlpatterns, "user")
+        missing = registered - scenarios.keys()
+        if missing:
+            raise CommandError(
+                f"No scenario for {', '.join(sorted(missing))}"
+            )
+
+        endpoints = {}
+        for name, (method, url, data) in sorted(scenarios.items()):
+            endpoints[name] = self.measure(
+                client, method, url, data, auth, options["iterations"]
+            )
+        return {
+            "seeded": seeded,
+            "iterations": options["iterations"],
+            "endpoints": endpoints,
+        }
+
+    @staticmethod
+    def measure(client, method, url, data, auth, iterations):
+        latencies = []
+        queries = []
+        status_codes = set()
+        size = 0
+        for _ in range(iterations):
+            payload = data() if callable(data) else data
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, payload, **auth)
+                if response.streaming:
+                    size = sum(len(chunk) for chunk in response)
+                else:
+                    size = len(response.content)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(context.captured_queries))
+            status_codes.add(response.status_code)
+        return {
+            "method": method.upper(),
+            "status": sorted(status_codes),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "queries_p50": percentile(queries, 0.5),
+            "queries_max": max(queries),
+            "bytes": size,
+        }
@@ -0,0 +1,248 @@
+import asyncio
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.benchmarking import (
+    add_use_existing_db_argument,
+    benchmark_database,
+)
+from airport.management.commands.bench_api import percentile
+from airport.models import Flight
+from airport.seeding import seed_data
+
+
+def split(total, parts):
+    return [total // parts + (index < total % parts) for index in range(parts)]
+
+
+def summarize(latencies, statuses, elapsed):
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "status": sorted(set(statuses)),
+    }
+
+
+async def asgi_request(application, path, token):
+    """One GET driven through the ASGI protocol the way uvicorn does"""
+    status = None
+    done = asyncio.Event()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif not message.get("more_body"):
+            done.set()
+
+    await application(
+        {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", f"Bearer {token}".encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        },
+        receive,
+        send,
+    )
+    return status
+
+
+def wsgi_request(application, path, token):
+    """One GET driven through the WSGI protocol the way gunicorn does"""
+    statuses = []
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "HTTP_HOST": "testserver",
+        "HTTP_AUTHORIZATION": f"Bearer {token}",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "wsgi.version": (1, 0),
+    }
+    body = application(
+        environ,
+        lambda status, headers, exc_info=None: statuses.append(status),
+    )
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+    return int(statuses[0].split()[0])
+
+
+class Command(BaseCommand):
+    """Compare the WSGI path with the sync and async ASGI paths"""
+
+    help = (
+        "Seed a throwaway test database and request flight list and detail "
+        "at high concurrency through the WSGI application (DRF views, one "
+        "thread per connection) and the ASGI application (DRF views behind "
+        "a thread hop, and the async views). Prints requests/sec and "
+        "p50/p95/p99 latency as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=50)
+        parser.add_argument("--flights", type=int, default=1000)
+        parser.add_argument("--tickets-per-flight", type=int, default=20)
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0)
+        add_use_existing_db_argument(parser)
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_existing_db"]):
+            # Throttling would turn most iterations into 429s
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_RATES": {},
+                },
+            ):
+                report = self.run(options)
+
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, options):
+        seeded = seed_data(
+            airports=options["airports"],
+            flights=options["flights"],
+            tickets_per_flight=options["tickets_per_flight"],
+            seed=options["seed"],
+        )
+        user = get_user_model().objects.order_by("id").first()
+        token = str(AccessToken.for_user(user))
+        flight_id = Flight.objects.order_by("id").values_list(
+            "id", flat=True
+        ).first()
+
+        endpoints = {
+            "flight-list": (
+                reverse("airport:flight-list"),
+                reverse("airport:async-flight-list"),
+            ),
+            "flight-detail": (
+                reverse("airport:flight-detail", args=[flight_id]),
+                reverse("airport:async-flight-detail", args=[flight_id]),
+            ),
+        }
+        wsgi = get_wsgi_application()
+        asgi = get_asgi_application()
+        report = {}
+        for name, (sync_path, async_path) in endpoints.items():
+            report[name] = {
+                "wsgi": self.bench_wsgi(wsgi, sync_path, token, options),
+                "asgi_sync_view": self.bench_asgi(
+                    asgi, sync_path, token, options
+                ),
+                "asgi_async_view": self.bench_asgi(
+                    asgi, async_path, token, options
+                ),
+            }
+        return {
+            "seeded": seeded,
+            "concurrency": options["concurrency"],
+            "endpoints": report,
+        }
+
+    @staticmethod
+    def bench_wsgi(application, path, token, options):
+        latencies = []
+        statuses = []
+        lock = threading.Lock()
+
+        def client(count):
+            local_latencies = []
+            local_statuses = []
+            for _ in range(count):
+                started = time.perf_counter()
+                local_statuses.append(
+                    wsgi_request(application, path, token)
+                )
+                local_latencies.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.extend(local_statuses)
+
+        counts = split(options["requests"], options["concurrency"])
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as executor:
+            list(executor.map(client, counts))
+        return summarize(latencies, statuses, time.perf_counter() - started)
+
+    @staticmethod
+    def bench_asgi(application, path, token, options):
+        latencies = []
+        statuses = []
+
+        async def client(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                statuses.append(
+                    await asgi_request(application, path, token)
+                )
+                latencies.append(time.perf_counter() - started)
+
+        async def main():
+            await asyncio.gather(
+                *(
+                    client(count)
+                    for count in split(
+                        options["requests"], options["concurrency"]
+                    )
+                )
+            )
+
+        started = time.perf_counter()
+        asyncio.run(main())
+        return summarize(latencies, statuses, time.perf_counter() - started)
@@ -0,0 +1,175 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from airport.benchmarking import (
+    add_use_existing_db_argument,
+    benchmark_database,
+)
+from airport.models import Airplane, AirplaneType, Airport, Flight, Route
+
+
+class Command(BaseCommand):
+    """Hammer one flight with concurrent bookings"""
+
+    help = (
+        "Book seats of a single flight from many threads through the "
+        "orders endpoint and report throughput and conflict rate as JSON. "
+        "Uses a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Booking attempts per worker")
+        parser.add_argument("--rows", type=int, default=30)
+        parser.add_argument("--seats-in-row", type=int, default=6)
+        parser.add_argument("--seats-per-order", type=int, default=1)
+        parser.add_argument(
+            "--lock",
+            choices=("none", "wait", "skip_locked"),
+            default="none",
+            help="SEAT_BOOKING_LOCK mode to benchmark",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        add_use_existing_db_argument(
+            parser,
+            help="Book in the configured database instead of a throwaway "
+                 "test database, removing the bench rows afterwards",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(
+            options["use_existing_db"], sqlite_name="bench_booking.sqlite3"
+        ):
+            flight = self.create_flight(options)
+            user, _ = get_user_model().objects.get_or_create(
+                email="bench-booking@example.com"
+            )
+            try:
+                report = self.run(flight, user, options)
+            finally:
+                if options["use_existing_db"]:
+                    self.delete_bench_rows(flight, user)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, flight, user, options):
+        url = reverse("airport:order-list")
+        seats = [
+            (row, seat)
+            for row in range(1, options["rows"] + 1)
+            for seat in range(1, options["seats_in_row"] + 1)
+        ]
+        statuses = Counter()
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(index):
+            rng = random.Random(options["seed"] + index)
+            client = APIClient()
+            client.force_authenticate(user)
+            local_statuses = Counter()
+            local_latencies = []
+            try:
+                for _ in range(options["requests"]):
+                    tickets = [
+                        {"row": row, "seat": seat, "flight": flight.id}
+                        for row, seat in rng.sample(
+                            seats, options["seats_per_order"]
+                        )
+                    ]
+                    started = time.perf_counter()
+                    res = client.post(url, {"tickets": tickets},
+                                      format="json")
+                    local_latencies.append(time.perf_counter() - started)
+                    local_statuses[res.status_code] += 1
+            finally:
+                connection.close()
+            with lock:
+                statuses.update(local_statuses)
+                latencies.extend(local_latencies)
+
+        with override_settings(
+            SEAT_BOOKING_LOCK=options["lock"],
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        ):
+            threads = [
+                threading.Thread(target=worker, args=(index,))
+                for index in range(options["workers"])
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        total = sum(statuses.values())
+        latencies.sort()
+        return {
+            "lock": options["lock"],
+            "workers": options["workers"],
+            "requests": total,
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(total / elapsed, 1),
+            "booked": statuses[201],
+            "conflicts": statuses[409],
+            "conflict_rate": round(statuses[409] / total, 4),
+            "other_statuses": {
+                str(code): count
+                for code, count in statuses.items()
+                if code not in {201, 409}
+            },
+            "p50_ms": round(latencies[total // 2] * 1000, 2),
+            "p95_ms": round(latencies[int(total * 0.95)] * 1000, 2),
+            "tickets_sold": flight.ticket_set.count(),
+            "capacity": len(seats),
+        }
+
+    @staticmethod
+    def delete_bench_rows(flight, user):
+        """Remove what the run added to the configured database"""
+        airplane = flight.airplane
+        route = flight.route
+        user.delete()
+        flight.delete()
+        route.source.delete()
+        route.destination.delete()
+        airplane.delete()
+        airplane.airplane_type.delete()
+
+    def create_flight(self, options):
+        source = Airport.objects.create(
+            name="Bench Source", closest_big_city="Bench"
+        )
+        destination = Airport.objects.create(
+            name="Bench Destination", closest_big_city="Bench"
+        )
+        route = Route.objects.create(
+            source=source, destination=destination, distance=1000
+        )
+        airplane = Airplane.objects.create(
+            name="Bench Airplane",
+            rows=options["rows"],
+            seats_in_row=options["seats_in_row"],
+            airplane_type=AirplaneType.objects.create(name="Bench"),
+        )
+        departure = timezone.now() + timedelta(days=1)
+        return Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=2),
+        )
@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.benchmarking import (
+    add_use_existing_db_argument,
+    benchmark_database,
+)
+from airport.management.commands.bench_asgi import (
+    split,
+    summarize,
+    wsgi_request,
+)
+from airport.models import Flight
+from airport.seeding import seed_data
+
+
+def pool_available():
+    if connection.vendor != "postgresql":
+        return False
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    """Per-request cost of opening database connections"""
+
+    help = (
+        "Request flight detail, which queries the database every time, "
+        "through the WSGI application with each POSTGRES_CONNECTIONS mode "
+        "(none, persistent, pool) and print requests/sec, latency and the "
+        "number of connections opened and queries run as JSON. Uses a "
+        "throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--conn-max-age", type=int, default=60)
+        parser.add_argument("--pool-max-size", type=int, default=10)
+        add_use_existing_db_argument(
+            parser,
+            help="Benchmark the configured database instead of a "
+                 "throwaway test database",
+        )
+
+    def handle(self, *args, **options):
+        db_settings = connections.settings[DEFAULT_DB_ALIAS]
+        original = {
+            key: db_settings[key]
+            for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS", "OPTIONS")
+        }
+        with benchmark_database(options["use_existing_db"]):
+            try:
+                with override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+                ):
+                    report = self.run(db_settings, options)
+            finally:
+                self.configure(db_settings, original)
+
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, db_settings, options):
+        user = get_user_model().objects.create_user(
+            "bench-connections@example.com", "bench-password"
+        )
+        token = str(AccessToken.for_user(user))
+        flight_id = self.flight_id(options)
+        path = reverse("airport:flight-detail", args=[flight_id])
+        application = get_wsgi_application()
+
+        db_options = {
+            key: value
+            for key, value in db_settings["OPTIONS"].items()
+            if key != "pool"
+        }
+        modes = {
+            "none": {
+                "CONN_MAX_AGE": 0,
+                "CONN_HEALTH_CHECKS": False,
+                "OPTIONS": db_options,
+            },
+            "persistent": {
+                "CONN_MAX_AGE": options["conn_max_age"],
+                "CONN_HEALTH_CHECKS": True,
+                "OPTIONS": db_options,
+            },
+        }
+        if pool_available():
+            modes["pool"] = {
+                "CONN_MAX_AGE": 0,
+                "CONN_HEALTH_CHECKS": False,
+                "OPTIONS": {
+                    **db_options,
+                    "pool": {
+                        "min_size": 1,
+                        "max_size": options["pool_max_size"],
+                    },
+                },
+            }
+
+        report = {}
+        for mode, mode_settings in modes.items():
+            self.configure(db_settings, mode_settings)
+            report[mode] = self.bench(application, path, token, options)
+        if "none" in report:
+            baseline = report["none"]["p50_ms"]
+            for result in report.values():
+                result["p50_saved_ms"] = round(
+                    baseline - result["p50_ms"], 2
+                )
+        if "pool" not in report:
+            report["pool"] = "psycopg 3 with psycopg_pool on PostgreSQL only"
+
+        user.delete()
+        return {
+            "vendor": connection.vendor,
+            "concurrency": options["concurrency"],
+            "modes": report,
+        }
+
+    @staticmethod
+    def flight_id(options):
+        """A flight to request, seeding one into the test database"""
+        flights = Flight.objects.order_by("id").values_list("id", flat=True)
+        if not flights.exists():
+            if options["use_existing_db"]:
+                raise CommandError("The configured database has no flights")
+            seed_data(airports=2, flights=1, tickets_per_flight=1, users=1)
+        return flights.first()
+
+    @staticmethod
+    def configure(db_settings, values):
+        """Apply connection settings to the connections opened from now
+        on. Worker threads build their own wrappers from db_settings."""
+        connections.close_all()
+        if hasattr(connection, "close_pool"):
+            connection.close_pool()
+        db_settings.update(values)
+
+    @staticmethod
+    def bench(application, path, token, options):
+        latencies = []
+        statuses = []
+        opened = []
+        queries = []
+        lock = threading.Lock()
+
+        def count_connection(sender, **kwargs):
+            with lock:
+                opened.append(kwargs["connection"].alias)
+
+        def client(count):
+            local_latencies = []
+            local_statuses = []
+            local_queries = []
+
+            def count_query(execute, sql, params, many, context):
+                local_queries.append(sql)
+                return execute(sql, params, many, context)
+
+            # The wrapper of this thread outlives reconnects
+            with connection.execute_wrapper(count_query):
+                for _ in range(count):
+                    started = time.perf_counter()
+                    local_statuses.append(
+                        wsgi_request(application, path, token)
+                    )
+                    local_latencies.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.extend(local_statuses)
+                queries.extend(local_queries)
+
+        connection_created.connect(count_connection)
+        try:
+            counts = split(options["requests"], options["concurrency"])
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options["concurrency"]) as executor:
+                list(executor.map(client, counts))
+            elapsed = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(count_connection)
+
+        result = summarize(latencies, statuses, elapsed)
+        if len(queries) < result["requests"]:
+            raise CommandError(
+                f"{path} ran {len(queries)} queries for "
+                f"{result['requests']} requests, so connections were not "
+                "measured"
+            )
+        result["connections_opened"] = len(opened)
+        result["queries"] = len(queries)
+        return result
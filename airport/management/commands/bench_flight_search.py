@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from airport.models import AirplaneType, Flight, Route
+from airport.seeding import seed_data
+
+
+class Command(BaseCommand):
+    """Seed flights and print query plans and timings for flight search"""
+
+    help = (
+        "Seed the database with flights and show the query plans of the "
+        "flight search filters. Writes to the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flights", type=int, default=1_000_000)
+        parser.add_argument("--airports", type=int, default=300)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--no-seed-data",
+            action="store_true",
+            help="Benchmark the flights already in the database",
+        )
+
+    def handle(self, *args, **options):
+        if not options["no_seed_data"]:
+            seed_data(
+                airports=options["airports"],
+                flights=options["flights"],
+                tickets_per_flight=0,
+                users=0,
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                log=self.stdout.write,
+            )
+
+        route = Route.objects.order_by("id").first()
+        airplane_type = AirplaneType.objects.values_list(
+            "id", flat=True
+        ).first()
+        if route is None or airplane_type is None:
+            self.stderr.write("Not enough data to benchmark")
+            return
+
+        source, destination = route.source_id, route.destination_id
+        start = timezone.now() + timedelta(days=30)
+        end = start + timedelta(days=7)
+        queries = {
+            "route": Flight.objects.filter(
+                route__source_id=source, route__destination_id=destination
+            ),
+            "source_and_window": Flight.objects.filter(
+                route__source_id=source,
+                departure_time__gte=start,
+                departure_time__lt=end,
+            ),
+            "route_and_window": Flight.objects.filter(
+                route__source_id=source,
+                route__destination_id=destination,
+                departure_time__gte=start,
+                departure_time__lt=end,
+            ),
+            "airplane_type_and_window": Flight.objects.filter(
+                airplane__airplane_type_id=airplane_type,
+                departure_time__gte=start,
+                departure_time__lt=end,
+            ),
+        }
+
+        for name, queryset in queries.items():
+            queryset = queryset.order_by("departure_time", "id")[:20]
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                list(queryset.values_list("id", flat=True))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
+            self.stdout.write(
+                f"p50 {timings[len(timings) // 2]:.2f} ms, "
+                f"max {timings[-1]:.2f} ms\n"
+            )
@@ -0,0 +1,98 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from airport.benchmarking import (
+    add_use_existing_db_argument,
+    benchmark_database,
+)
+from airport.row_serializers import flight_rows, ticket_rows
+from airport.seeding import seed_data
+from airport.views import FlightViewSet, TicketViewSet
+
+
+class Command(BaseCommand):
+    """Measure rows/sec of the list serializers and the row serializers"""
+
+    help = (
+        "Seed a throwaway test database and print, as JSON, how many rows "
+        "per second the flight and ticket list serializers and their "
+        "values() row serializers turn into JSON, queries included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=50)
+        parser.add_argument("--flights", type=int, default=2000)
+        parser.add_argument("--tickets-per-flight", type=int, default=5)
+        parser.add_argument(
+            "--rows", type=int, default=1000, help="Rows per list"
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        add_use_existing_db_argument(
+            parser, help="Benchmark the data of the configured database"
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_existing_db"]):
+            if not options["use_existing_db"]:
+                seed_data(
+                    airports=options["airports"],
+                    flights=options["flights"],
+                    tickets_per_flight=options["tickets_per_flight"],
+                    seed=options["seed"],
+                )
+            report = self.run(options)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, options):
+        request = Request(APIRequestFactory().get("/"))
+        renderer = JSONRenderer()
+        report = {}
+        for name, viewset, row_serializer in (
+            ("flights", FlightViewSet, flight_rows),
+            ("tickets", TicketViewSet, ticket_rows),
+        ):
+            view = viewset(
+                action="list", request=request, format_kwarg=None, kwargs={}
+            )
+            queryset = view.get_queryset().order_by(
+                *view.pagination_class.ordering
+            )
+            serializer_class = view.get_serializer_class()
+            context = view.get_serializer_context()
+            paths = {
+                "serializer": lambda: serializer_class(
+                    queryset[:options["rows"]], many=True, context=context
+                ).data,
+                "row_serializer": lambda: row_serializer.to_representation(
+                    row_serializer.values(queryset)[:options["rows"]]
+                ),
+            }
+
+            result, outputs = {}, {}
+            for path, serialize in paths.items():
+                outputs[path] = renderer.render(serialize())
+                started = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    renderer.render(serialize())
+                elapsed = time.perf_counter() - started
+                rows = len(json.loads(outputs[path]))
+                result["rows"] = rows
+                result[f"{path}_rows_per_sec"] = round(
+                    rows * options["repeat"] / elapsed
+                )
+            result["speedup"] = round(
+                result["row_serializer_rows_per_sec"]
+                / result["serializer_rows_per_sec"],
+                2,
+            )
+            result["identical"] = (
+                outputs["serializer"] == outputs["row_serializer"]
+            )
+            report[name] = result
+        return report
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from airport.schedule_import import IMPORT_BATCH_SIZE, import_schedule
+
+
+class Command(BaseCommand):
+    """Create flights from a timetable CSV"""
+
+    help = (
+        "Import a timetable CSV with the columns source, destination, "
+        "airplane, departure_time, arrival_time and optionally crew "
+        "(full names separated by ';'). Nothing is created if a row is "
+        "invalid; flights that already exist are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--batch-size", type=int, default=IMPORT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        with open(options["path"], "rb") as csv_file:
+            try:
+                result = import_schedule(
+                    csv_file, batch_size=options["batch_size"]
+                )
+            except ValidationError as exc:
+                raise CommandError(self.format_errors(exc.detail))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result['created']} flights, "
+                f"skipped {result['skipped']} existing"
+            )
+        )
+
+    @staticmethod
+    def format_errors(detail):
+        if "lines" in detail:
+            return "\n".join(
+                f"line {line}: {' '.join(messages)}"
+                for line, messages in detail["lines"].items()
+            )
+        return "\n".join(
+            f"{field}: {message}" for field, message in detail.items()
+        )
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from airport.models import FlightSchedule
+from airport.schedules import MATERIALIZE_BATCH_SIZE, materialize_schedules
+
+
+class Command(BaseCommand):
+    """Create the flights of recurring flight schedules"""
+
+    help = (
+        "Create the flights of flight schedules up to --until (by default "
+        "SCHEDULE_HORIZON_DAYS from today). Days already materialized are "
+        "skipped, so running it daily extends the horizon incrementally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--until", help="Last day as YYYY-MM-DD")
+        parser.add_argument(
+            "--schedule",
+            type=int,
+            action="append",
+            dest="schedules",
+            help="Only this schedule id, may be repeated",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=MATERIALIZE_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        until = None
+        if options["until"]:
+            try:
+                until = parse_date(options["until"])
+            except ValueError:
+                until = None
+            if until is None:
+                raise CommandError("--until must be a date as YYYY-MM-DD")
+        schedules = None
+        if options["schedules"]:
+            schedules = FlightSchedule.objects.filter(
+                pk__in=options["schedules"]
+            )
+        result = materialize_schedules(
+            until, schedules=schedules, batch_size=options["batch_size"]
+        )
+        for conflict in result["conflicts"]:
+            self.stderr.write(
+                f"Schedule {conflict['schedule']}: airplane busy at "
+                f"{conflict['departure_time']:%Y-%m-%d %H:%M}, "
+                "flight not created"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result['created']} flights "
+                f"for {result['schedules']} schedules"
+            )
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from airport.search_rows import SEARCH_ROW_BATCH_SIZE, rebuild_search_rows
+
+
+class Command(BaseCommand):
+    """Repair the denormalized flight search table"""
+
+    help = (
+        "Compare every flight with its FlightSearchRow and rewrite the "
+        "rows that are missing or out of date. Safe to run at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=SEARCH_ROW_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        result = rebuild_search_rows(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {result['checked']} flights, "
+                f"repaired {result['repaired']} search rows"
+            )
+        )
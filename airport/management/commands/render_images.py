@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from airport.models import Airplane, Airport
+from airport.thumbnails import render_renditions, save_renditions
+
+
+class Command(BaseCommand):
+    """Render missing or outdated renditions of uploaded images"""
+
+    help = (
+        "Render the IMAGE_RENDITIONS of every airport and airplane image "
+        "that has none yet or whose image changed since they were made."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Render current renditions again",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Airport, Airplane):
+            rendered = 0
+            for instance in model.objects.exclude(image="").exclude(
+                image__isnull=True
+            ).only("id", "image", "image_renditions"):
+                source = instance.image_renditions.get("source")
+                if source == instance.image.name and not options["force"]:
+                    continue
+                save_renditions(
+                    model, instance.pk, render_renditions(instance.image.name)
+                )
+                rendered += 1
+            self.stdout.write(
+                f"Rendered {rendered} {model._meta.verbose_name_plural}"
+            )
@@ -0,0 +1,64 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from airport.seeding import is_seeded, seed_data
+
+
+class Command(BaseCommand):
+    """Fill the database with deterministic synthetic data"""
+
+    help = (
+        "Generate airports, routes, airplanes, crews, flights, users, "
+        "orders and tickets with bulk inserts. The same --seed and --start "
+        "produce the same data. Each --seed can be written once per "
+        "database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=50)
+        parser.add_argument("--flights", type=int, default=1000)
+        parser.add_argument("--tickets-per-flight", type=int, default=20)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--routes-per-airport", type=int, default=4)
+        parser.add_argument("--crew-per-flight", type=int, default=2)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            help="First departure day as YYYY-MM-DD (default: today)",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Flights written per transaction")
+
+    def handle(self, *args, **options):
+        if is_seeded(options["seed"]):
+            raise CommandError(
+                f"Seed {options['seed']} is already in this database, "
+                "use another --seed or an empty database"
+            )
+        started = time.perf_counter()
+        created = seed_data(
+            airports=options["airports"],
+            flights=options["flights"],
+            tickets_per_flight=options["tickets_per_flight"],
+            users=options["users"],
+            routes_per_airport=options["routes_per_airport"],
+            crew_per_flight=options["crew_per_flight"],
+            seed=options["seed"],
+            start=options["start"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+
+        rows = sum(created.values())
+        for model, count in created.items():
+            self.stdout.write(f"{model}: {count}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {rows} rows in {elapsed:.1f}s "
+                f"({rows / elapsed:,.0f} rows/s)"
+            )
+        )
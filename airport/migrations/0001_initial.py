@@ -0,0 +1,129 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:06
+
+import airport.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AirplaneType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Airport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('closest_big_city', models.CharField(max_length=100)),
+                ('image', models.ImageField(null=True, upload_to=airport.models.airport_airplane_image_file_path)),
+                ('image_renditions', models.JSONField(default=dict, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Crew',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Flight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Route',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Ticket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.IntegerField()),
+                ('seat', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Airplane',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('rows', models.IntegerField()),
+                ('seats_in_row', models.IntegerField()),
+                ('image', models.ImageField(null=True, upload_to=airport.models.airport_airplane_image_file_path)),
+                ('image_renditions', models.JSONField(default=dict, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('airplane_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='airport.airplanetype')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FlightSearchRow',
+            fields=[
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_row', serialize=False, to='airport.flight')),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('source_name', models.CharField(max_length=100)),
+                ('destination_name', models.CharField(max_length=100)),
+                ('airplane_name', models.CharField(max_length=100)),
+                ('capacity', models.IntegerField()),
+                ('tickets_sold', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='airplane',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='airport.airplane'),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='crew',
+            field=models.ManyToManyField(to='airport.crew'),
+        ),
+        migrations.CreateModel(
+            name='FlightSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days_of_week', models.PositiveSmallIntegerField()),
+                ('departure_time', models.TimeField()),
+                ('block_time', models.DurationField()),
+                ('valid_from', models.DateField()),
+                ('valid_to', models.DateField()),
+                ('materialized_until', models.DateField(editable=False, null=True)),
+                ('airplane', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='airport.airplane')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='flights', to='airport.flightschedule'),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('airport', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='destination',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arrivals', to='airport.airport'),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='airport.airport'),
+        ),
+        migrations.AddField(
+            model_name='flightschedule',
+            name='route',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='airport.route'),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='route',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='airport.route'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='flight',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='airport.flight'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='airport.order'),
+        ),
+        migrations.AddField(
+            model_name='flightsearchrow',
+            name='airplane',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='airport.airplane'),
+        ),
+        migrations.AddField(
+            model_name='flightsearchrow',
+            name='airplane_type',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='airport.airplanetype'),
+        ),
+        migrations.AddField(
+            model_name='flightsearchrow',
+            name='destination',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='airport.airport'),
+        ),
+        migrations.AddField(
+            model_name='flightsearchrow',
+            name='route',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='airport.route'),
+        ),
+        migrations.AddField(
+            model_name='flightsearchrow',
+            name='source',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='airport.airport'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(fields=['source', 'destination'], name='route_source_destination_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_time', 'id'], name='flight_departure_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['route', 'departure_time'], name='flight_route_departure_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.UniqueConstraint(fields=('schedule', 'departure_time'), name='flight_schedule_departure_unique'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ticket',
+            unique_together={('flight', 'row', 'seat')},
+        ),
+        migrations.AddIndex(
+            model_name='flightsearchrow',
+            index=models.Index(fields=['departure_time', 'flight'], name='search_departure_flight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightsearchrow',
+            index=models.Index(fields=['source', 'departure_time'], name='search_source_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightsearchrow',
+            index=models.Index(fields=['destination', 'departure_time'], name='search_dest_departure_idx'),
+        ),
+    ]
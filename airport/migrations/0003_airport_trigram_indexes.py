@@ -0,0 +1,24 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """pg_trgm GIN indexes behind airport autocomplete"""
+
+    dependencies = [
+        ("airport", "0002_initial"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            "CREATE INDEX airport_name_trgm_idx ON airport_airport "
+            "USING gin (UPPER(name) gin_trgm_ops)",
+            "DROP INDEX airport_name_trgm_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX airport_city_trgm_idx ON airport_airport "
+            "USING gin (UPPER(closest_big_city) gin_trgm_ops)",
+            "DROP INDEX airport_city_trgm_idx",
+        ),
+    ]
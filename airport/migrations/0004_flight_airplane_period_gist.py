@@ -0,0 +1,21 @@
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """GiST index behind airplane overlap lookups. The range is the same
+    expression as airport.conflicts.flight_period()."""
+
+    dependencies = [
+        ("airport", "0003_airport_trigram_indexes"),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunSQL(
+            "CREATE INDEX flight_airplane_period_gist ON airport_flight "
+            "USING gist (airplane_id, TSTZRANGE(departure_time, "
+            "GREATEST(arrival_time, departure_time)))",
+            "DROP INDEX flight_airplane_period_gist",
+        ),
+    ]
@@ -1,12 +1,15 @@
 import os
 import uuid
+from datetime import timedelta
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 from django.utils.text import slugify
 from rest_framework.exceptions import ValidationError
-from rest_framework.utils import timezone
 from django.conf import settings
 
+from airport.exceptions import SeatReservedError
+
 
 def airport_airplane_image_file_path(instance, filename):
     _, extension = os.path.splitext(filename)
@@ -22,6 +25,8 @@ class Airport(models.Model):
     closest_big_city = models.CharField(max_length=100)
     image = models.ImageField(null=True,
                               upload_to=airport_airplane_image_file_path)
+    image_renditions = models.JSONField(default=dict, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -35,6 +40,15 @@ class Route(models.Model):
         Airport, related_name="arrivals", on_delete=models.CASCADE
     )
     distance = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["source", "destination"],
+                name="route_source_destination_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.source} → {self.destination}"
@@ -69,6 +83,8 @@ class Airplane(models.Model):
                                       on_delete=models.CASCADE)
     image = models.ImageField(null=True,
                               upload_to=airport_airplane_image_file_path)
+    image_renditions = models.JSONField(default=dict, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def capacity(self) -> int:
@@ -81,6 +97,7 @@ class Airplane(models.Model):
 class Crew(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"id {self.id} {self.first_name} {self.last_name}"
@@ -90,29 +107,166 @@ class Crew(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
+class FlightSchedule(models.Model):
+    """A flight repeated on some days of the week between two dates"""
+
+    route = models.ForeignKey(Route, on_delete=models.CASCADE)
+    airplane = models.ForeignKey(Airplane, on_delete=models.CASCADE)
+    # Bit n - 1 set for ISO weekday n (Monday is 1)
+    days_of_week = models.PositiveSmallIntegerField()
+    departure_time = models.TimeField()
+    block_time = models.DurationField()
+    valid_from = models.DateField()
+    valid_to = models.DateField()
+    # Last day whose flights were created, later runs continue after it
+    materialized_until = models.DateField(null=True, editable=False)
+
+    def __str__(self):
+        return (
+            f"{self.route} at {self.departure_time:%H:%M} "
+            f"from {self.valid_from} to {self.valid_to}"
+        )
+
+    @property
+    def weekdays(self):
+        return [
+            day for day in range(1, 8) if self.days_of_week >> (day - 1) & 1
+        ]
+
+    def clean(self):
+        if not 0 < self.days_of_week < 1 << 7:
+            raise ValidationError("Select at least one day of the week.")
+        if self.valid_to < self.valid_from:
+            raise ValidationError("Validity must end on or after its start.")
+        if self.block_time <= timedelta(0):
+            raise ValidationError("Block time must be positive.")
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+
+
 class Flight(models.Model):
     route = models.ForeignKey(Route, on_delete=models.CASCADE)
     airplane = models.ForeignKey(Airplane, on_delete=models.CASCADE)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
     crew = models.ManyToManyField(Crew)
+    schedule = models.ForeignKey(
+        FlightSchedule,
+        null=True,
+        blank=True,
+        related_name="flights",
+        on_delete=models.SET_NULL,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["schedule", "departure_time"],
+                name="flight_schedule_departure_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["departure_time", "id"],
+                name="flight_departure_id_idx",
+            ),
+            models.Index(
+                fields=["route", "departure_time"],
+                name="flight_route_departure_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.route} on {self.departure_time}"
 
-    def clean(self):
-        if self.departure_time < timezone.now():
+    @staticmethod
+    def validate_times(departure_time, arrival_time, now=None):
+        if departure_time < (now or timezone.now()):
             raise ValidationError("Departure time cannot be in the past.")
 
-        if self.arrival_time <= self.departure_time:
+        if arrival_time <= departure_time:
             raise ValidationError("Arrival time must be after departure time.")
 
+    def clean(self):
+        Flight.validate_times(self.departure_time, self.arrival_time)
+
+
+class FlightSearchRow(models.Model):
+    """Flight joined with its route, airports, airplane and sold seat
+    count, so flight search reads one table. Kept in sync by
+    airport.search_rows."""
+
+    flight = models.OneToOneField(
+        Flight,
+        primary_key=True,
+        related_name="search_row",
+        on_delete=models.CASCADE,
+    )
+    # Plain references: rows go away with their flight
+    route = models.ForeignKey(
+        Route, related_name="+", on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    source = models.ForeignKey(
+        Airport, related_name="+", on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    destination = models.ForeignKey(
+        Airport, related_name="+", on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    airplane = models.ForeignKey(
+        Airplane, related_name="+", on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    airplane_type = models.ForeignKey(
+        AirplaneType, related_name="+", on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+    source_name = models.CharField(max_length=100)
+    destination_name = models.CharField(max_length=100)
+    airplane_name = models.CharField(max_length=100)
+    capacity = models.IntegerField()
+    tickets_sold = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["departure_time", "flight"],
+                name="search_departure_flight_idx",
+            ),
+            models.Index(
+                fields=["source", "departure_time"],
+                name="search_source_departure_idx",
+            ),
+            models.Index(
+                fields=["destination", "departure_time"],
+                name="search_dest_departure_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Search row of flight {self.flight_id}"
+
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"],
+                name="order_created_id_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user}"
 
@@ -121,7 +275,9 @@ class Ticket(models.Model):
     row = models.IntegerField()
     seat = models.IntegerField()
     flight = models.ForeignKey(Flight, on_delete=models.CASCADE)
-    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    order = models.ForeignKey(
+        Order, related_name="tickets", on_delete=models.CASCADE
+    )
 
     class Meta:
         unique_together = ("flight", "row", "seat")
@@ -149,17 +305,27 @@ class Ticket(models.Model):
         Ticket.validate_row(self.flight, self.row)
         Ticket.validate_seat(self.flight, self.seat, self.row)
 
-        if (
-            Ticket.objects.filter(
-                flight=self.flight,
-                row=self.row,
-                seat=self.seat
-            )
-            .exclude(pk=self.pk)
-            .exists()
-        ):
-            raise ValidationError("This seat already reserved")
-
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
+        # The (flight, row, seat) constraint decides who gets the seat
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError:
+            if (
+                Ticket.objects.filter(
+                    flight_id=self.flight_id, row=self.row, seat=self.seat
+                )
+                .exclude(pk=self.pk)
+                .exists()
+            ):
+                raise SeatReservedError()
+            raise
+
+    def delete(self, *args, **kwargs):
+        # airport.signals imports this module
+        from airport.signals import update_ticket_flights
+
+        result = super().delete(*args, **kwargs)
+        update_ticket_flights([self.flight_id])
+        return result
@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class FlightPagination(KeysetPagination):
+    ordering = ("departure_time", "id")
+
+
+class FlightSearchPagination(KeysetPagination):
+    ordering = ("departure_time", "flight_id")
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class TicketPagination(KeysetPagination):
+    ordering = ("-id",)
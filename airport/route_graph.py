@@ -0,0 +1,125 @@
+import heapq
+import threading
+import time
+
+from django.conf import settings
+
+from airport.cache import get_model_versions
+from airport.models import Route
+
+
+class RouteGraph:
+    """In-memory adjacency of the route network.
+
+    adjacency maps a source airport id to {route_id: (destination_id,
+    distance)}. The graph is built with one query on first use, patched by
+    the Route signals of this process and rebuilt when the Route cache
+    generation shows another process changed routes. Other processes see
+    that generation only through a shared cache (CACHE_BACKEND), so the
+    graph is also rebuilt after ITINERARY_GRAPH_MAX_AGE seconds.
+
+    Patches replace adjacency and the edge dicts they change instead of
+    mutating them, so a search keeps iterating the graph it started with.
+    """
+
+    def __init__(self):
+        self.adjacency = {}
+        self.version = None
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def current_version(self):
+        return get_model_versions([Route])[0]
+
+    def rebuild(self):
+        adjacency = {}
+        routes = Route.objects.values_list(
+            "id", "source_id", "destination_id", "distance"
+        )
+        for route_id, source_id, destination_id, distance in routes:
+            adjacency.setdefault(source_id, {})[route_id] = (
+                destination_id,
+                distance,
+            )
+        with self.lock:
+            self.adjacency = adjacency
+            self.version = self.current_version()
+            self.built_at = time.monotonic()
+
+    def ensure_current(self):
+        if (
+            self.version is None
+            or self.version != self.current_version()
+            or time.monotonic() - self.built_at
+            > settings.ITINERARY_GRAPH_MAX_AGE
+        ):
+            self.rebuild()
+
+    def add_route(self, route):
+        with self.lock:
+            if self.version is None:
+                return
+            adjacency = dict(self.adjacency)
+            # The source may have changed, drop the route wherever it is
+            for source_id, edges in self.adjacency.items():
+                if route.id in edges:
+                    adjacency[source_id] = {
+                        route_id: edge
+                        for route_id, edge in edges.items()
+                        if route_id != route.id
+                    }
+            adjacency[route.source_id] = {
+                **adjacency.get(route.source_id, {}),
+                route.id: (route.destination_id, route.distance),
+            }
+            self.adjacency = adjacency
+            self.version = self.current_version()
+
+    def remove_route(self, route):
+        with self.lock:
+            if self.version is None:
+                return
+            edges = self.adjacency.get(route.source_id, {})
+            if route.id in edges:
+                self.adjacency = {
+                    **self.adjacency,
+                    route.source_id: {
+                        route_id: edge
+                        for route_id, edge in edges.items()
+                        if route_id != route.id
+                    },
+                }
+            self.version = self.current_version()
+
+    def paths(self, source_id, destination_id, max_legs, limit):
+        """Yield up to `limit` simple paths as (distance, [route ids]),
+        shortest first, with at most `max_legs` routes each."""
+        self.ensure_current()
+        adjacency = self.adjacency
+        heap = [(0, [source_id], [])]
+        found = 0
+        while heap and found < limit:
+            distance, airports, route_ids = heapq.heappop(heap)
+            airport_id = airports[-1]
+            if airport_id == destination_id and route_ids:
+                found += 1
+                yield distance, route_ids
+                continue
+            if len(route_ids) == max_legs:
+                continue
+            for route_id, (next_airport, leg) in adjacency.get(
+                airport_id, {}
+            ).items():
+                if next_airport in airports:
+                    continue
+                heapq.heappush(
+                    heap,
+                    (
+                        distance + leg,
+                        airports + [next_airport],
+                        route_ids + [route_id],
+                    ),
+                )
+
+
+route_graph = RouteGraph()
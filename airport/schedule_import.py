@@ -0,0 +1,205 @@
+"""
+Bulk import of flight timetables from CSV.
+
+Expected columns: source, destination, airplane, departure_time,
+arrival_time and an optional crew column of full names separated by ";".
+Files are read as UTF-8, with or without a byte order mark.
+Airports, routes, airplanes and crew are resolved by name from lookup
+tables loaded with one query each. Every row is checked in one pass
+before anything is written. A file with errors creates no flights.
+"""
+
+import csv
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from airport.models import Airplane, Airport, Crew, Flight, Route
+from airport.search_rows import sync_flight_ids
+from airport.seeding import copy_rows
+
+IMPORT_COLUMNS = (
+    "source",
+    "destination",
+    "airplane",
+    "departure_time",
+    "arrival_time",
+)
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+AMBIGUOUS = object()
+
+
+def name_lookup(pairs):
+    """{name: id}, names used more than once map to AMBIGUOUS"""
+    lookup = {}
+    for name, pk in pairs:
+        lookup[name] = AMBIGUOUS if name in lookup else pk
+    return lookup
+
+
+def resolve(lookup, name, label):
+    pk = lookup.get(name)
+    if pk is None:
+        raise ValidationError(f"Unknown {label} '{name}'")
+    if pk is AMBIGUOUS:
+        raise ValidationError(f"More than one {label} is named '{name}'")
+    return pk
+
+
+def decode_lines(binary_file):
+    """Text lines of a CSV opened in binary mode. A line that is not
+    UTF-8 raises a ValidationError reporting it like a row error."""
+    for line, data in enumerate(binary_file, start=1):
+        try:
+            yield data.decode("utf-8-sig" if line == 1 else "utf-8")
+        except UnicodeDecodeError:
+            raise ValidationError(
+                {"lines": {line: ["Line is not UTF-8 text"]}}
+            )
+
+
+def parse_time(value, column):
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError(
+            f"{column} must be a date and time as YYYY-MM-DD HH:MM"
+        )
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class ScheduleImporter:
+    def __init__(self):
+        self.airports = name_lookup(Airport.objects.values_list("name", "id"))
+        self.routes = {
+            (source, destination): pk
+            for pk, source, destination in Route.objects.values_list(
+                "id", "source_id", "destination_id"
+            )
+        }
+        self.airplanes = name_lookup(
+            Airplane.objects.values_list("name", "id")
+        )
+        self.crew = name_lookup(
+            (f"{first_name} {last_name}", pk)
+            for pk, first_name, last_name in Crew.objects.values_list(
+                "id", "first_name", "last_name"
+            )
+        )
+        self.now = timezone.now()
+
+    def parse_row(self, row):
+        """(route_id, airplane_id, departure, arrival, crew_ids)"""
+        # DictReader keys extra cells by None and fills missing ones
+        # with None
+        if None in row:
+            raise ValidationError("Too many cells")
+        for column in IMPORT_COLUMNS:
+            if not (row[column] or "").strip():
+                raise ValidationError(f"Missing {column}")
+        source = resolve(self.airports, row["source"].strip(), "airport")
+        destination = resolve(
+            self.airports, row["destination"].strip(), "airport"
+        )
+        route = self.routes.get((source, destination))
+        if route is None:
+            raise ValidationError(
+                f"No route from '{row['source']}' "
+                f"to '{row['destination']}'"
+            )
+        airplane = resolve(self.airplanes, row["airplane"].strip(), "airplane")
+        departure_time = parse_time(row["departure_time"], "departure_time")
+        arrival_time = parse_time(row["arrival_time"], "arrival_time")
+        Flight.validate_times(departure_time, arrival_time, now=self.now)
+        crew = {
+            resolve(self.crew, name.strip(), "crew member"): None
+            for name in (row.get("crew") or "").split(";")
+            if name.strip()
+        }
+        return route, airplane, departure_time, arrival_time, list(crew)
+
+    def parse(self, csv_file):
+        reader = csv.DictReader(csv_file)
+        missing = set(IMPORT_COLUMNS) - set(reader.fieldnames or ())
+        if missing:
+            raise ValidationError(
+                {"file": f"Missing columns: {', '.join(sorted(missing))}"}
+            )
+
+        rows, errors = [], {}
+        for line, row in enumerate(reader, start=2):
+            try:
+                rows.append(self.parse_row(row))
+            except ValidationError as exc:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors[line] = exc.detail
+        if errors:
+            # Keyed by CSV line number, the header being line 1
+            raise ValidationError({"lines": errors})
+        return rows
+
+    @staticmethod
+    def existing_flights(rows):
+        """(route, airplane, departure) of the flights already stored in
+        the time span of the file"""
+        if not rows:
+            return set()
+        departures = [row[2] for row in rows]
+        return set(
+            Flight.objects.filter(
+                departure_time__range=(min(departures), max(departures))
+            ).values_list("route_id", "airplane_id", "departure_time")
+        )
+
+    def run(self, csv_file, batch_size=IMPORT_BATCH_SIZE):
+        rows = self.parse(csv_file)
+        seen = self.existing_flights(rows)
+        flights, crews = [], []
+        for route, airplane, departure_time, arrival_time, crew in rows:
+            if (route, airplane, departure_time) in seen:
+                continue
+            seen.add((route, airplane, departure_time))
+            flights.append(
+                Flight(
+                    route_id=route,
+                    airplane_id=airplane,
+                    departure_time=departure_time,
+                    arrival_time=arrival_time,
+                )
+            )
+            crews.append(crew)
+
+        with transaction.atomic():
+            flights = Flight.objects.bulk_create(
+                flights, batch_size=batch_size
+            )
+            crew_rows = [
+                (flight.id, crew_id)
+                for flight, crew in zip(flights, crews)
+                for crew_id in crew
+            ]
+            for start in range(0, len(crew_rows), batch_size):
+                copy_rows(
+                    Flight.crew.through,
+                    ("flight", "crew"),
+                    crew_rows[start:start + batch_size],
+                )
+            sync_flight_ids(
+                (flight.id for flight in flights), batch_size=batch_size
+            )
+        return {"created": len(flights), "skipped": len(rows) - len(flights)}
+
+
+def import_schedule(csv_file, batch_size=IMPORT_BATCH_SIZE):
+    """Create the flights of a timetable CSV opened in binary mode and
+    return how many were created and how many already existed"""
+    return ScheduleImporter().run(
+        decode_lines(csv_file), batch_size=batch_size
+    )
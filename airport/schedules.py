@@ -0,0 +1,223 @@
+"""
+Concrete flights of recurring flight schedules.
+
+Each schedule remembers the last day its flights were created for, in
+materialized_until. Extending the horizon only builds the days after it.
+Days on which the schedule already has a flight are left out, and
+flights are inserted with bulk_create(ignore_conflicts=True) against the
+(schedule, departure_time) constraint, so a flight that already exists
+is never updated or duplicated, even when two runs overlap. A flight
+whose airplane is on another flight at that time, stored or created in
+the same run, is not created either and is reported as a conflict.
+Editing a schedule replaces its future flights without tickets through
+rebuild_schedule_flights. Days of the flights with tickets it keeps get
+no new flight.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from airport.conflicts import find_conflicts
+from airport.models import Airplane, Flight, FlightSchedule
+from airport.search_rows import sync_search_rows
+
+MATERIALIZE_BATCH_SIZE = 5000
+# Schedule fields its flights are built from
+FLIGHT_FIELDS = (
+    "route_id",
+    "airplane_id",
+    "days_of_week",
+    "departure_time",
+    "block_time",
+    "valid_from",
+    "valid_to",
+)
+
+
+def weekdays_to_mask(weekdays):
+    return sum(1 << (day - 1) for day in set(weekdays))
+
+
+def default_horizon():
+    return timezone.localdate() + timedelta(
+        days=settings.SCHEDULE_HORIZON_DAYS
+    )
+
+
+def schedule_flights(schedule, first_day, last_day, now):
+    """Unsaved flights of schedule departing between first_day and
+    last_day inclusive, leaving out departures before now"""
+    flights = []
+    day = first_day
+    while day <= last_day:
+        if schedule.days_of_week >> (day.isoweekday() - 1) & 1:
+            departure_time = timezone.make_aware(
+                datetime.combine(day, schedule.departure_time)
+            )
+            if departure_time >= now:
+                flights.append(
+                    Flight(
+                        route_id=schedule.route_id,
+                        airplane_id=schedule.airplane_id,
+                        schedule=schedule,
+                        departure_time=departure_time,
+                        arrival_time=departure_time + schedule.block_time,
+                    )
+                )
+        day += timedelta(days=1)
+    return flights
+
+
+def drop_scheduled_days(flights, first_day):
+    """flights without those departing on a day their schedule already
+    has a flight for"""
+    taken = {
+        (schedule_id, timezone.localdate(departure_time))
+        for schedule_id, departure_time in Flight.objects.filter(
+            schedule__in={flight.schedule_id for flight in flights},
+            departure_time__gte=timezone.make_aware(
+                datetime.combine(first_day, datetime.min.time())
+            ),
+        ).values_list("schedule_id", "departure_time")
+    }
+    return [
+        flight
+        for flight in flights
+        if (flight.schedule_id, timezone.localdate(flight.departure_time))
+        not in taken
+    ]
+
+
+def drop_busy_airplanes(flights):
+    """(flights, conflicts): flights without those whose airplane is on a
+    stored flight at that time, or on one of flights departing before.
+    Call it in a transaction: the airplanes stay locked like in
+    check_assignment."""
+    if not flights:
+        return flights, []
+    airplane_ids = {flight.airplane_id for flight in flights}
+    list(
+        Airplane.objects.select_for_update()
+        .filter(pk__in=airplane_ids)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    stored = Flight.objects.filter(
+        airplane_id__in=airplane_ids,
+        departure_time__lt=max(flight.arrival_time for flight in flights),
+        arrival_time__gt=min(flight.departure_time for flight in flights),
+    ).values_list("id", "airplane_id", "departure_time", "arrival_time")
+    # Unsaved flights take negative ids
+    intervals = [
+        (airplane_id, flight_id, departure_time, arrival_time)
+        for flight_id, airplane_id, departure_time, arrival_time in stored
+    ]
+    intervals.extend(
+        (flight.airplane_id, -index, flight.departure_time,
+         flight.arrival_time)
+        for index, flight in enumerate(flights, start=1)
+    )
+    pairs = [
+        (first, second)
+        for _, first, second, _, _ in find_conflicts(intervals)
+    ]
+    busy = defaultdict(list)
+    for first, second in pairs:
+        if (first < 0) != (second < 0):
+            busy[-min(first, second)].append(max(first, second))
+    # Pairs come by departure of the second flight, so whether the first
+    # one is left out is known
+    for first, second in pairs:
+        if first < 0 and second < 0 and -first not in busy:
+            busy.setdefault(-second, [])
+
+    conflicts = [
+        {
+            "schedule": flights[index - 1].schedule_id,
+            "departure_time": flights[index - 1].departure_time,
+            "flights": sorted(flight_ids),
+        }
+        for index, flight_ids in sorted(busy.items())
+    ]
+    return [
+        flight
+        for index, flight in enumerate(flights, start=1)
+        if index not in busy
+    ], conflicts
+
+
+def materialize_schedules(
+    until=None, schedules=None, batch_size=MATERIALIZE_BATCH_SIZE
+):
+    """Create the flights of schedules (all by default) up to and
+    including the day until (SCHEDULE_HORIZON_DAYS from today by
+    default). Return how many schedules were extended, how many flights
+    were created and the flights left out because their airplane was
+    busy."""
+    until = until or default_horizon()
+    if schedules is None:
+        schedules = FlightSchedule.objects.all()
+    now = timezone.now()
+    today = timezone.localdate()
+
+    flights, extended, first_days = [], [], []
+    for schedule in schedules.filter(valid_to__gte=today):
+        first_day = max(schedule.valid_from, today)
+        if schedule.materialized_until:
+            first_day = max(
+                first_day, schedule.materialized_until + timedelta(days=1)
+            )
+        last_day = min(schedule.valid_to, until)
+        if first_day > last_day:
+            continue
+        flights.extend(schedule_flights(schedule, first_day, last_day, now))
+        schedule.materialized_until = last_day
+        extended.append(schedule)
+        first_days.append(first_day)
+
+    with transaction.atomic():
+        if flights:
+            flights = drop_scheduled_days(flights, min(first_days))
+        flights, conflicts = drop_busy_airplanes(flights)
+        # ignore_conflicts leaves the primary keys unset, so the rows
+        # created are counted instead
+        scheduled = Flight.objects.filter(schedule__in=extended)
+        before = scheduled.count()
+        Flight.objects.bulk_create(
+            flights, batch_size=batch_size, ignore_conflicts=True
+        )
+        created = scheduled.count() - before
+        sync_search_rows(scheduled.filter(search_row__isnull=True))
+        FlightSchedule.objects.bulk_update(
+            extended, ["materialized_until"], batch_size=batch_size
+        )
+    return {
+        "schedules": len(extended),
+        "created": created,
+        "conflicts": conflicts,
+    }
+
+
+def rebuild_schedule_flights(schedule):
+    """Delete the future flights of an edited schedule that have no
+    tickets and build them again up to the day reached before. Flights
+    with tickets are kept unchanged."""
+    until = schedule.materialized_until
+    with transaction.atomic():
+        schedule.flights.filter(
+            departure_time__gte=timezone.now(), ticket__isnull=True
+        ).delete()
+        schedule.materialized_until = None
+        FlightSchedule.objects.filter(pk=schedule.pk).update(
+            materialized_until=None
+        )
+        if until is None:
+            return {"schedules": 0, "created": 0, "conflicts": []}
+        return materialize_schedules(
+            until=until,
+            schedules=FlightSchedule.objects.filter(pk=schedule.pk),
+        )
@@ -0,0 +1,149 @@
+"""
+Maintenance of the denormalized FlightSearchRow table.
+
+Flight writes upsert the rows of the flights involved, ticket writes
+recount tickets_sold of their flights, and renaming an airport or
+changing an airplane or route updates the copied columns of the affected
+rows in one UPDATE. Writes that bypass signals (bulk imports, schedule
+materialization, seeding) call sync_search_rows themselves.
+rebuild_search_rows repairs any drift from a full scan.
+"""
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from airport.models import Flight, FlightSearchRow, Ticket
+
+SEARCH_ROW_BATCH_SIZE = 2000
+
+# FlightSearchRow field: Flight lookup it is copied from
+SEARCH_ROW_SOURCES = {
+    "flight_id": "id",
+    "route_id": "route_id",
+    "source_id": "route__source_id",
+    "destination_id": "route__destination_id",
+    "airplane_id": "airplane_id",
+    "airplane_type_id": "airplane__airplane_type_id",
+    "departure_time": "departure_time",
+    "arrival_time": "arrival_time",
+    "source_name": "route__source__name",
+    "destination_name": "route__destination__name",
+    "airplane_name": "airplane__name",
+    "capacity": "capacity",
+    "tickets_sold": "tickets_sold",
+}
+UPDATE_FIELDS = [
+    field.removesuffix("_id")
+    for field in SEARCH_ROW_SOURCES
+    if field != "flight_id"
+]
+
+
+def search_row_values(flights):
+    """Rows of flights as tuples in SEARCH_ROW_SOURCES order"""
+    return (
+        flights.order_by("id")
+        .annotate(
+            capacity=F("airplane__rows") * F("airplane__seats_in_row"),
+            tickets_sold=Count("ticket"),
+        )
+        .values_list(*SEARCH_ROW_SOURCES.values())
+    )
+
+
+def build_rows(values):
+    return [
+        FlightSearchRow(**dict(zip(SEARCH_ROW_SOURCES, row)))
+        for row in values
+    ]
+
+
+def upsert_rows(rows):
+    FlightSearchRow.objects.bulk_create(
+        rows,
+        batch_size=SEARCH_ROW_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["flight"],
+        update_fields=UPDATE_FIELDS,
+    )
+
+
+def sync_search_rows(flights):
+    """Create or refresh the rows of the flights of a queryset"""
+    upsert_rows(build_rows(search_row_values(flights)))
+
+
+def sync_flight_ids(flight_ids, batch_size=SEARCH_ROW_BATCH_SIZE):
+    flight_ids = list(flight_ids)
+    for start in range(0, len(flight_ids), batch_size):
+        sync_search_rows(
+            Flight.objects.filter(id__in=flight_ids[start:start + batch_size])
+        )
+
+
+def refresh_tickets_sold(flight_ids):
+    FlightSearchRow.objects.filter(flight_id__in=flight_ids).update(
+        tickets_sold=Coalesce(
+            Subquery(
+                Ticket.objects.filter(flight_id=OuterRef("flight_id"))
+                .order_by()
+                .values("flight_id")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+
+
+def update_airport_rows(airport):
+    FlightSearchRow.objects.filter(source_id=airport.pk).update(
+        source_name=airport.name
+    )
+    FlightSearchRow.objects.filter(destination_id=airport.pk).update(
+        destination_name=airport.name
+    )
+
+
+def update_airplane_rows(airplane):
+    FlightSearchRow.objects.filter(airplane_id=airplane.pk).update(
+        airplane_name=airplane.name,
+        airplane_type_id=airplane.airplane_type_id,
+        capacity=airplane.rows * airplane.seats_in_row,
+    )
+
+
+def update_route_rows(route):
+    FlightSearchRow.objects.filter(route_id=route.pk).update(
+        source_id=route.source_id,
+        destination_id=route.destination_id,
+        source_name=route.source.name,
+        destination_name=route.destination.name,
+    )
+
+
+def rebuild_search_rows(batch_size=SEARCH_ROW_BATCH_SIZE):
+    """Compare every flight with its row and rewrite the missing or stale
+    ones. Return how many flights were checked and rows repaired."""
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        values = list(
+            search_row_values(Flight.objects.filter(id__gt=last_id))[
+                :batch_size
+            ]
+        )
+        if not values:
+            break
+        last_id = values[-1][0]
+        stored = {
+            row[0]: row
+            for row in FlightSearchRow.objects.filter(
+                flight_id__in=[row[0] for row in values]
+            ).values_list(*SEARCH_ROW_SOURCES)
+        }
+        stale = [row for row in values if stored.get(row[0]) != row]
+        upsert_rows(build_rows(stale))
+        checked += len(values)
+        repaired += len(stale)
+    return {"checked": checked, "repaired": repaired}
@@ -0,0 +1,30 @@
+import base64
+
+
+def build_seat_bitmap(rows, seats_in_row, taken):
+    """Pack taken seats into a bitset, one bit per seat, row-major.
+
+    Seat (row, seat) maps to bit (row - 1) * seats_in_row + (seat - 1),
+    most significant bit first within each byte.
+    """
+    bitmap = bytearray((rows * seats_in_row + 7) // 8)
+    for row, seat in taken:
+        index = (row - 1) * seats_in_row + (seat - 1)
+        bitmap[index >> 3] |= 0x80 >> (index & 7)
+    return bytes(bitmap)
+
+
+def encode_seat_bitmap(bitmap):
+    return base64.b64encode(bitmap).decode("ascii")
+
+
+def build_row_runs(taken):
+    """Group taken seats into runs: {row: [[first_seat, length], ...]}."""
+    runs = {}
+    for row, seat in sorted(taken):
+        row_runs = runs.setdefault(str(row), [])
+        if row_runs and row_runs[-1][0] + row_runs[-1][1] == seat:
+            row_runs[-1][1] += 1
+        else:
+            row_runs.append([seat, 1])
+    return runs
@@ -0,0 +1,297 @@
+import io
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+from airport.search_rows import sync_flight_ids
+
+AIRPLANE_TYPES = ("Narrow-body", "Wide-body", "Regional", "Turboprop")
+SEED_PASSWORD = "seed-password"
+
+
+def copy_rows(model, fields, rows):
+    """Insert plain value tuples without building model instances.
+
+    PostgreSQL gets a single COPY per call, other backends a plain
+    executemany() INSERT.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    model_fields = [model._meta.get_field(field) for field in fields]
+    columns = ", ".join(
+        connection.ops.quote_name(field.column) for field in model_fields
+    )
+
+    if connection.vendor != "postgresql":
+        datetime_columns = [
+            index for index, field in enumerate(model_fields)
+            if field.get_internal_type() == "DateTimeField"
+        ]
+        if datetime_columns:
+            adapted = {}
+
+            def adapt(value):
+                if value not in adapted:
+                    adapted[value] = (
+                        connection.ops.adapt_datetimefield_value(value)
+                    )
+                return adapted[value]
+
+            rows = [
+                tuple(
+                    adapt(value) if index in datetime_columns else value
+                    for index, value in enumerate(row)
+                )
+                for row in rows
+            ]
+        placeholders = ", ".join(["%s"] * len(fields))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                rows,
+            )
+        return
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(map(str, row)))
+        buffer.write("\n")
+    buffer.seek(0)
+    sql = f"COPY {table} ({columns}) FROM STDIN"
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, "copy_expert"):  # psycopg2
+            raw_cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def reserve_ids(model, count):
+    """Primary keys for rows written with copy_rows()"""
+    table = model._meta.db_table
+    column = model._meta.pk.column
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, %s)) "
+                "FROM generate_series(1, %s)",
+                [table, column, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f"SELECT MAX({connection.ops.quote_name(column)}) "
+            f"FROM {connection.ops.quote_name(table)}"
+        )
+        first = (cursor.fetchone()[0] or 0) + 1
+    return list(range(first, first + count))
+
+
+def is_seeded(seed):
+    """Whether users generated with this seed are already stored."""
+    return get_user_model().objects.filter(
+        email__endswith=f".{seed}@seed.example.com"
+    ).exists()
+
+
+def seed_data(
+    airports=50,
+    flights=1000,
+    tickets_per_flight=20,
+    users=100,
+    routes_per_airport=4,
+    crew_per_flight=2,
+    seed=0,
+    start=None,
+    batch_size=5000,
+    log=None,
+):
+    """Fill every airport model and user.User with synthetic data.
+
+    Everything is written with bulk_create or COPY in batches of flights,
+    so Ticket.save() and the model signals are bypassed. Tickets take
+    distinct seats inside each airplane's rows x seats_in_row geometry.
+    The same seed and start date always produce the same rows; user emails
+    include the seed so different seeds can share a database, but the same
+    seed can only be written once per database (see is_seeded()). Returns
+    the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    start = start or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(start, time.min))
+    log = log or (lambda message: None)
+    created = {}
+
+    with transaction.atomic():
+        airplane_types = AirplaneType.objects.bulk_create(
+            AirplaneType(name=name) for name in AIRPLANE_TYPES
+        )
+        airport_objects = Airport.objects.bulk_create(
+            (
+                Airport(name=f"Airport {i}", closest_big_city=f"City {i}")
+                for i in range(airports)
+            ),
+            batch_size=batch_size,
+        )
+        route_pairs = set()
+        for source in range(airports):
+            for destination in rng.sample(
+                range(airports), min(routes_per_airport + 1, airports)
+            ):
+                if source != destination:
+                    route_pairs.add((source, destination))
+        route_objects = Route.objects.bulk_create(
+            (
+                Route(
+                    source=airport_objects[source],
+                    destination=airport_objects[destination],
+                    distance=rng.randint(200, 9000),
+                )
+                for source, destination in sorted(route_pairs)
+            ),
+            batch_size=batch_size,
+        )
+        airplane_objects = Airplane.objects.bulk_create(
+            Airplane(
+                name=f"Airplane {i}",
+                rows=rng.randint(20, 40),
+                seats_in_row=rng.choice((4, 6, 6, 8)),
+                airplane_type=rng.choice(airplane_types),
+            )
+            for i in range(max(10, airports // 5))
+        )
+        crew_ids = [
+            crew.id
+            for crew in Crew.objects.bulk_create(
+                (
+                    Crew(first_name=f"First {i}", last_name=f"Last {i}")
+                    for i in range(max(20, airports * 2))
+                ),
+                batch_size=batch_size,
+            )
+        ]
+        password = make_password(SEED_PASSWORD)
+        user_ids = [
+            user.id
+            for user in get_user_model().objects.bulk_create(
+                (
+                    get_user_model()(
+                        email=f"user{i}.{seed}@seed.example.com",
+                        password=password,
+                    )
+                    for i in range(users)
+                ),
+                batch_size=batch_size,
+            )
+        ]
+    created.update(
+        airplane_types=len(airplane_types),
+        airports=len(airport_objects),
+        routes=len(route_objects),
+        airplanes=len(airplane_objects),
+        crews=len(crew_ids),
+        users=len(user_ids),
+        flights=0,
+        orders=0,
+        tickets=0,
+    )
+
+    crew_through = Flight.crew.through
+    remaining = flights
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        remaining -= size
+        with transaction.atomic():
+            flight_objects = []
+            for _ in range(size):
+                route = rng.choice(route_objects)
+                departure = start + timedelta(
+                    minutes=rng.randrange(60, 365 * 24 * 60, 5)
+                )
+                flight_objects.append(
+                    Flight(
+                        route=route,
+                        airplane=rng.choice(airplane_objects),
+                        departure_time=departure,
+                        arrival_time=departure + timedelta(
+                            minutes=30 + route.distance // 12
+                        ),
+                    )
+                )
+            flight_objects = Flight.objects.bulk_create(flight_objects)
+            copy_rows(
+                crew_through,
+                ("flight", "crew"),
+                [
+                    (flight.id, crew_id)
+                    for flight in flight_objects
+                    for crew_id in rng.sample(
+                        crew_ids, min(crew_per_flight, len(crew_ids))
+                    )
+                ],
+            )
+
+            order_seats = []
+            for flight in flight_objects:
+                airplane = flight.airplane
+                seats = rng.sample(
+                    range(airplane.capacity),
+                    min(tickets_per_flight, airplane.capacity),
+                )
+                while seats and user_ids:
+                    size_of_order = rng.randint(1, 4)
+                    order_seats.append(
+                        (rng.choice(user_ids), flight.id,
+                         airplane.seats_in_row, seats[:size_of_order])
+                    )
+                    seats = seats[size_of_order:]
+
+            order_ids = reserve_ids(Order, len(order_seats))
+            created_at = timezone.now()
+            copy_rows(
+                Order,
+                ("id", "created_at", "user"),
+                [
+                    (order_id, created_at, user_id)
+                    for order_id, (user_id, _, _, _) in zip(
+                        order_ids, order_seats
+                    )
+                ],
+            )
+            tickets = [
+                (
+                    index // seats_in_row + 1,
+                    index % seats_in_row + 1,
+                    flight_id,
+                    order_id,
+                )
+                for order_id, (_, flight_id, seats_in_row, seats) in zip(
+                    order_ids, order_seats
+                )
+                for index in seats
+            ]
+            copy_rows(Ticket, ("row", "seat", "flight", "order"), tickets)
+            sync_flight_ids(flight.id for flight in flight_objects)
+
+        created["flights"] += len(flight_objects)
+        created["orders"] += len(order_ids)
+        created["tickets"] += len(tickets)
+        log(
+            f"Seeded {created['flights']} flights, "
+            f"{created['tickets']} tickets"
+        )
+
+    return created
@@ -1,7 +1,17 @@
-from django.db import transaction
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from airport.autocomplete import AUTOCOMPLETE_MAX_LIMIT
+from airport.conditional import touch_flights
+from airport.conflicts import check_assignment
+from airport.exceptions import SeatBusyError, SeatReservedError
 from airport.models import (
     Airport,
     Route,
@@ -9,9 +19,14 @@ from airport.models import (
     Airplane,
     Crew,
     Flight,
+    FlightSchedule,
+    FlightSearchRow,
     Order,
     Ticket,
 )
+from airport.schedules import weekdays_to_mask
+from airport.search_rows import refresh_tickets_sold
+from airport.thumbnails import rendition_urls
 
 
 class AirportSerializer(serializers.ModelSerializer):
@@ -22,14 +37,53 @@ class AirportSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+@extend_schema_field(
+    {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "additionalProperties": {"type": "string", "format": "uri"},
+        },
+    }
+)
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """URLs of the resized renditions of the current image by size and
+    format, empty until the worker pool has rendered them"""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return rendition_urls(instance, self.context.get("request"))
+
+
 class AirportListSerializer(AirportSerializer):
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Airport
-        fields = ("id", "name", "closest_big_city", "image")
+        fields = ("id", "name", "closest_big_city", "image",
+                  "image_renditions")
         read_only_fields = ("id",)
 
 
+class AirportAutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(
+        max_length=100,
+        help_text="Start of, or a misspelling of, an airport name or city",
+    )
+    limit = serializers.IntegerField(
+        default=10, min_value=1, max_value=AUTOCOMPLETE_MAX_LIMIT
+    )
+
+
+class AirportAutocompleteSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    closest_big_city = serializers.CharField()
+
+
 class AirplaneTypeSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -95,6 +149,7 @@ class AirplaneSerializer(serializers.ModelSerializer):
 class AirplaneListSerializer(AirplaneSerializer):
 
     airplane_type = AirplaneTypeSerializer(many=False, read_only=True)
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Airplane
@@ -106,6 +161,7 @@ class AirplaneListSerializer(AirplaneSerializer):
             "capacity",
             "airplane_type",
             "image",
+            "image_renditions",
         )
         read_only_fields = (
             "capacity",
@@ -166,6 +222,60 @@ class FlightSerializer(serializers.ModelSerializer):
                   "crew")
         read_only_fields = ("id",)
 
+    def current(self, attrs, field):
+        """Value of field after this save, for partial updates too"""
+        if field in attrs:
+            return attrs[field]
+        return getattr(self.instance, field)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        departure_time = self.current(attrs, "departure_time")
+        arrival_time = self.current(attrs, "arrival_time")
+        if self.instance is None:
+            Flight.validate_times(departure_time, arrival_time)
+        elif arrival_time <= departure_time:
+            raise ValidationError("Arrival time must be after departure time.")
+        if self.instance is not None and "airplane" in attrs:
+            self.validate_seats_fit(attrs["airplane"])
+        return attrs
+
+    def validate_seats_fit(self, airplane):
+        """Sold seats must exist on the new airplane"""
+        outside = Ticket.objects.filter(flight=self.instance).filter(
+            Q(row__gt=airplane.rows) | Q(seat__gt=airplane.seats_in_row)
+        )
+        if outside.exists():
+            raise ValidationError(
+                {
+                    "airplane": "Tickets sold for this flight have seats "
+                                "outside this airplane's rows and seats."
+                }
+            )
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            self.check_assignment(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self.check_assignment(validated_data)
+            return super().update(instance, validated_data)
+
+    def check_assignment(self, validated_data):
+        """Refuse to double-book the airplane or a crew member"""
+        crew = self.current(validated_data, "crew")
+        if not isinstance(crew, list):
+            crew = crew.all()
+        check_assignment(
+            self.current(validated_data, "airplane").pk,
+            [member.pk for member in crew],
+            self.current(validated_data, "departure_time"),
+            self.current(validated_data, "arrival_time"),
+            flight_id=self.instance and self.instance.pk,
+        )
+
 
 class FlightListSerializer(FlightSerializer):
 
@@ -174,6 +284,18 @@ class FlightListSerializer(FlightSerializer):
     crew = serializers.SlugRelatedField(
         many=True, read_only=True, slug_field="full_name"
     )
+    tickets_available = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Flight
+        fields = ("id",
+                  "route",
+                  "airplane",
+                  "departure_time",
+                  "arrival_time",
+                  "crew",
+                  "tickets_available")
+        read_only_fields = ("id",)
 
 
 class FlightDetailSerializer(FlightListSerializer):
@@ -187,10 +309,159 @@ class FlightDetailSerializer(FlightListSerializer):
                   "airplane",
                   "departure_time",
                   "arrival_time",
-                  "crew")
+                  "crew",
+                  "tickets_available")
         read_only_fields = ("id", "crew")
 
 
+class FlightSearchRowSerializer(serializers.ModelSerializer):
+
+    id = serializers.IntegerField(source="flight_id", read_only=True)
+    source = serializers.CharField(source="source_name", read_only=True)
+    destination = serializers.CharField(
+        source="destination_name", read_only=True
+    )
+    airplane = serializers.CharField(source="airplane_name", read_only=True)
+    tickets_available = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FlightSearchRow
+        fields = ("id",
+                  "route",
+                  "source",
+                  "destination",
+                  "airplane",
+                  "departure_time",
+                  "arrival_time",
+                  "capacity",
+                  "tickets_available")
+        read_only_fields = fields
+
+    def get_tickets_available(self, obj) -> int:
+        return obj.capacity - obj.tickets_sold
+
+
+class FlightScheduleSerializer(serializers.ModelSerializer):
+
+    days_of_week = serializers.ListField(
+        source="weekdays",
+        child=serializers.IntegerField(min_value=1, max_value=7),
+        allow_empty=False,
+        help_text="ISO weekdays the flight operates on, Monday being 1",
+    )
+
+    class Meta:
+        model = FlightSchedule
+        fields = ("id",
+                  "route",
+                  "airplane",
+                  "days_of_week",
+                  "departure_time",
+                  "block_time",
+                  "valid_from",
+                  "valid_to",
+                  "materialized_until")
+        read_only_fields = ("id", "materialized_until")
+
+    def validate(self, attrs):
+        if "weekdays" in attrs:
+            attrs["days_of_week"] = weekdays_to_mask(attrs.pop("weekdays"))
+        return attrs
+
+
+class MaterializeSchedulesSerializer(serializers.Serializer):
+    until = serializers.DateField(
+        required=False,
+        help_text="Last day to create flights for, "
+                  "SCHEDULE_HORIZON_DAYS from today by default",
+    )
+
+
+class ScheduleConflictSerializer(serializers.Serializer):
+    schedule = serializers.IntegerField()
+    departure_time = serializers.DateTimeField()
+    flights = serializers.ListField(
+        child=serializers.IntegerField(),
+        help_text="Stored flights of the airplane at that time, empty when "
+                  "it is another schedule's flight created in the same run",
+    )
+
+
+class MaterializeResultSerializer(serializers.Serializer):
+    schedules = serializers.IntegerField(
+        help_text="Schedules whose flights were extended"
+    )
+    created = serializers.IntegerField()
+    conflicts = ScheduleConflictSerializer(
+        many=True,
+        help_text="Flights not created because their airplane is busy",
+    )
+
+
+class ScheduleImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    skipped = serializers.IntegerField(
+        help_text="Rows matching a flight that already exists"
+    )
+
+
+class FlightConflictQuerySerializer(serializers.Serializer):
+    start = serializers.DateTimeField(
+        required=False,
+        help_text="Only flights landing after it, now by default",
+    )
+    end = serializers.DateTimeField(
+        required=False,
+        help_text="Only flights departing before it",
+    )
+
+    def validate(self, attrs):
+        start, end = attrs.get("start"), attrs.get("end")
+        if start and end and end <= start:
+            raise ValidationError("End must be after start")
+        return attrs
+
+
+class FlightConflictSerializer(serializers.Serializer):
+    resource = serializers.ChoiceField(choices=("airplane", "crew"))
+    resource_id = serializers.IntegerField(
+        help_text="Id of the airplane or crew member booked twice"
+    )
+    flight = serializers.IntegerField(help_text="Flight departing first")
+    conflicting_flight = serializers.IntegerField()
+    overlap_start = serializers.DateTimeField()
+    overlap_end = serializers.DateTimeField()
+
+
+class ItinerarySearchSerializer(serializers.Serializer):
+    source = serializers.IntegerField()
+    destination = serializers.IntegerField()
+    departure_date = serializers.DateField(required=False)
+    max_stops = serializers.IntegerField(
+        default=1, min_value=0, max_value=settings.ITINERARY_MAX_STOPS
+    )
+    ordering = serializers.ChoiceField(
+        choices=("distance", "duration"), default="distance"
+    )
+    limit = serializers.IntegerField(default=10, min_value=1, max_value=50)
+
+    def validate(self, attrs):
+        if attrs["source"] == attrs["destination"]:
+            raise ValidationError(
+                "Source and destination airports cannot be the same"
+            )
+        return attrs
+
+
+class ItinerarySerializer(serializers.Serializer):
+    stops = serializers.IntegerField()
+    distance = serializers.IntegerField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    duration = serializers.DurationField()
+    flights = FlightListSerializer(many=True)
+
+
 class TicketSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
@@ -207,20 +478,185 @@ class TicketSerializer(serializers.ModelSerializer):
         model = Ticket
         fields = ("id", "row", "seat", "flight", "order")
         read_only_fields = ("id",)
+        # Seat conflicts come from the unique constraint on insert
+        validators = []
+
+
+class TicketFlightSerializer(FlightListSerializer):
+    """Flight of a ticket. Ticket and order lists do not count the tickets
+    of every flight, so tickets_available is left out."""
+
+    tickets_available = None
+
+    class Meta:
+        model = Flight
+        fields = ("id",
+                  "route",
+                  "airplane",
+                  "departure_time",
+                  "arrival_time",
+                  "crew")
+        read_only_fields = ("id",)
 
 
 class TicketListSerializer(TicketSerializer):
-    flight = FlightListSerializer(many=False, read_only=True)
+    flight = TicketFlightSerializer(many=False, read_only=True)
+
+
+class OrderTicketSerializer(serializers.ModelSerializer):
+    flight = serializers.IntegerField(source="flight_id")
+
+    class Meta:
+        model = Ticket
+        fields = ("id", "row", "seat", "flight")
+        read_only_fields = ("id",)
 
 
 class OrderSerializer(serializers.ModelSerializer):
-    ticket = TicketSerializer(many=False, read_only=True)
+    tickets = OrderTicketSerializer(many=True, allow_empty=False)
 
     class Meta:
         model = Order
-        fields = ("id", "created_at", "user", "ticket")
-        read_only_fields = ("id",)
+        fields = ("id", "created_at", "user", "tickets")
+        read_only_fields = ("id", "user")
+
+    def validate_tickets(self, tickets):
+        flights = Flight.objects.select_related("airplane").in_bulk(
+            {ticket["flight_id"] for ticket in tickets}
+        )
+        errors = []
+        booked = set()
+        for ticket in tickets:
+            error = {}
+            flight = flights.get(ticket["flight_id"])
+            if flight is None:
+                error["flight"] = [
+                    f"Invalid pk \"{ticket['flight_id']}\" "
+                    f"- object does not exist."
+                ]
+            else:
+                try:
+                    Ticket.validate_row(flight, ticket["row"])
+                except ValidationError as exc:
+                    error["row"] = exc.detail
+                try:
+                    Ticket.validate_seat(flight, ticket["seat"], ticket["row"])
+                except ValidationError as exc:
+                    error["seat"] = exc.detail
+
+            seat_key = (ticket["flight_id"], ticket["row"], ticket["seat"])
+            if seat_key in booked:
+                error["seat"] = ["This seat is booked twice in the order"]
+            booked.add(seat_key)
+            errors.append(error)
+
+        if any(errors):
+            raise ValidationError(errors)
+        return tickets
+
+    @staticmethod
+    def reserved_seat_errors(tickets):
+        reserved = set(
+            Ticket.objects.filter(
+                reduce(
+                    or_,
+                    (
+                        Q(
+                            flight_id=ticket["flight_id"],
+                            row=ticket["row"],
+                            seat=ticket["seat"],
+                        )
+                        for ticket in tickets
+                    ),
+                )
+            ).values_list("flight_id", "row", "seat")
+        )
+        return [
+            {"seat": ["This seat already reserved"]}
+            if (ticket["flight_id"], ticket["row"], ticket["seat"]) in reserved
+            else {}
+            for ticket in tickets
+        ]
+
+    @staticmethod
+    def lock_seats(tickets):
+        """Hold the seats of tickets for the transaction with PostgreSQL
+        advisory locks if SEAT_BOOKING_LOCK asks for it: "wait" queues
+        concurrent bookings of the same seat, "skip_locked" turns them
+        away with 409 instead of waiting. Other seats of the flight stay
+        free to book. Other databases rely on the unique constraint."""
+        mode = settings.SEAT_BOOKING_LOCK
+        if (
+            mode not in {"wait", "skip_locked"}
+            or connection.vendor != "postgresql"
+        ):
+            return
+        # Distinct per seat below 1024 rows and seats; a shared key only
+        # makes two bookings wait for each other
+        keys = sorted(
+            {
+                ticket["flight_id"] << 20 | ticket["row"] << 10
+                | ticket["seat"]
+                for ticket in tickets
+            }
+        )
+        function = (
+            "pg_try_advisory_xact_lock"
+            if mode == "skip_locked"
+            else "pg_advisory_xact_lock"
+        )
+        with connection.cursor() as cursor:
+            # unnest yields the keys in order, so locks are taken in order
+            cursor.execute(
+                f"SELECT {function}(key) FROM unnest(%s::bigint[]) AS key",
+                [keys],
+            )
+            locked = [row[0] for row in cursor.fetchall()]
+        if mode == "skip_locked" and not all(locked):
+            raise SeatBusyError()
+
+    def save_tickets(self, order, tickets_data, flight_ids):
+        """Insert the tickets of the order in one query and update the
+        flights they were or are booked on"""
+        try:
+            with transaction.atomic():
+                Ticket.objects.bulk_create(
+                    [
+                        Ticket(order=order, **ticket_data)
+                        for ticket_data in tickets_data
+                    ]
+                )
+        except IntegrityError:
+            errors = self.reserved_seat_errors(tickets_data)
+            if not any(errors):
+                raise
+            raise SeatReservedError({"tickets": errors})
+        touch_flights(flight_ids)
+        refresh_tickets_sold(flight_ids)
+
+    def create(self, validated_data):
+        tickets_data = validated_data.pop("tickets")
+        flight_ids = {ticket_data["flight_id"] for ticket_data in tickets_data}
+        with transaction.atomic():
+            self.lock_seats(tickets_data)
+            order = Order.objects.create(**validated_data)
+            self.save_tickets(order, tickets_data, flight_ids)
+            return order
+
+    def update(self, instance, validated_data):
+        """Replace the tickets of the order when they are given"""
+        tickets_data = validated_data.pop("tickets", None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if tickets_data is not None:
+                flight_ids = set(
+                    instance.tickets.values_list("flight_id", flat=True)
+                ) | {ticket_data["flight_id"] for ticket_data in tickets_data}
+                self.lock_seats(tickets_data)
+                instance.tickets.all().delete()
+                self.save_tickets(instance, tickets_data, flight_ids)
+            return instance
 
 
 class OrderListSerializer(OrderSerializer):
-    ticket = TicketListSerializer(many=False, read_only=True)
+    tickets = TicketListSerializer(many=True, read_only=True)
@@ -0,0 +1,136 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from airport.cache import bump_model_version
+from airport.conditional import touch_flights
+from airport.route_graph import route_graph
+from airport.search_rows import (
+    refresh_tickets_sold,
+    sync_search_rows,
+    update_airplane_rows,
+    update_airport_rows,
+    update_route_rows,
+)
+from airport.thumbnails import schedule_renditions
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+
+REFERENCE_DATA_MODELS = (Airport, AirplaneType, Airplane, Crew, Route)
+
+
+def invalidate_reference_data(sender, **kwargs):
+    # After commit, so readers cannot cache uncommitted rows under the new
+    # generation
+    transaction.on_commit(partial(bump_model_version, sender))
+
+
+for model in REFERENCE_DATA_MODELS:
+    post_save.connect(
+        invalidate_reference_data,
+        sender=model,
+        dispatch_uid=f"invalidate_{model._meta.model_name}_on_save",
+    )
+    post_delete.connect(
+        invalidate_reference_data,
+        sender=model,
+        dispatch_uid=f"invalidate_{model._meta.model_name}_on_delete",
+    )
+
+
+def update_ticket_flights(flight_ids):
+    """Touch the flights whose tickets changed and recount their sold
+    seats, one UPDATE each for all of them"""
+    touch_flights(flight_ids)
+    refresh_tickets_sold(flight_ids)
+
+
+@receiver(post_save, sender=Ticket)
+def touch_ticket_flight(sender, instance, **kwargs):
+    update_ticket_flights([instance.flight_id])
+
+
+# No delete receivers on Ticket: they would stop Django from deleting the
+# tickets of an order or flight in one query. Ticket.delete() covers
+# single tickets, and the tickets of a deleted flight go with it.
+@receiver(pre_delete, sender=Order)
+def collect_order_flights(sender, instance, **kwargs):
+    instance.ticket_flight_ids = list(
+        instance.tickets.values_list("flight_id", flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Order)
+def touch_order_flights(sender, instance, **kwargs):
+    update_ticket_flights(instance.ticket_flight_ids)
+
+
+@receiver(post_save, sender=Flight)
+def sync_flight_search_row(sender, instance, **kwargs):
+    sync_search_rows(Flight.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Airport)
+def sync_airport_search_rows(sender, instance, **kwargs):
+    update_airport_rows(instance)
+
+
+@receiver(post_save, sender=Airplane)
+def sync_airplane_search_rows(sender, instance, **kwargs):
+    update_airplane_rows(instance)
+
+
+@receiver(post_save, sender=Route)
+def sync_route_search_rows(sender, instance, **kwargs):
+    update_route_rows(instance)
+
+
+@receiver(m2m_changed, sender=Flight.crew.through)
+def touch_crew_flights(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in {"post_add", "post_remove", "pre_clear"}:
+        return
+    if not reverse:
+        touch_flights([instance.pk])
+    elif action == "pre_clear":
+        touch_flights(instance.flight_set.values("id"))
+    else:
+        touch_flights(pk_set)
+
+
+@receiver(pre_delete, sender=Crew)
+def touch_deleted_crew_flights(sender, instance, **kwargs):
+    touch_flights(instance.flight_set.values("id"))
+
+
+@receiver(post_save, sender=Route)
+def add_route_to_graph(sender, instance, **kwargs):
+    route_graph.add_route(instance)
+
+
+@receiver(post_delete, sender=Route)
+def remove_route_from_graph(sender, instance, **kwargs):
+    route_graph.remove_route(instance)
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_save, sender=Airplane)
+def render_image_renditions(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if instance.image_renditions.get("source") != instance.image.name:
+        transaction.on_commit(partial(schedule_renditions, instance))
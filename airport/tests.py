@@ -1,12 +1,36 @@
+import base64
+import json
+import tempfile
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.test import APIClient
 from rest_framework.exceptions import ValidationError
-from datetime import timedelta
+from rest_framework_simplejwt.tokens import AccessToken
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from PIL import Image
 
+from airport.cache import get_model_versions
+from airport.conflicts import find_conflicts
+from airport.exceptions import SeatReservedError
+from airport.route_graph import route_graph
+from airport.schedules import materialize_schedules
+from airport.search_rows import refresh_tickets_sold
 from airport.models import (
     Airport,
     AirplaneType,
@@ -14,15 +38,20 @@ from airport.models import (
     Route,
     Crew,
     Flight,
+    FlightSchedule,
+    FlightSearchRow,
     Order,
     Ticket,
 )
 from airport.serializers import (
+    AirportListSerializer,
     AirportSerializer,
     AirplaneSerializer,
     FlightSerializer,
     TicketSerializer,
 )
+from airport_api import throttling
+from airport_api.metrics import registry
 
 AIRPORTS_URL = reverse("airport:airport-list")
 AIRPLANES_URL = reverse("airport:airplane-list")
@@ -107,7 +136,7 @@ class PrivateAirportApiTests(TestCase):
         res = self.client.get(AIRPORTS_URL)
 
         airports = Airport.objects.all()
-        serializer = AirportSerializer(airports, many=True)
+        serializer = AirportListSerializer(airports, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
@@ -135,6 +164,122 @@ class AdminAirportApiTests(TestCase):
             self.assertEqual(payload[key], getattr(airport, key))
 
 
+AIRPORT_AUTOCOMPLETE_URL = reverse("airport:airport-autocomplete")
+
+
+class AirportAutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.heathrow = sample_airport(
+            name="London Heathrow", closest_big_city="London"
+        )
+        self.gatwick = sample_airport(
+            name="Gatwick", closest_big_city="London"
+        )
+        self.lviv = sample_airport(name="Lviv", closest_big_city="Lviv")
+        self.jfk = sample_airport(
+            name="John F. Kennedy", closest_big_city="New York"
+        )
+
+    def names(self, **params):
+        res = self.client.get(AIRPORT_AUTOCOMPLETE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [airport["name"] for airport in res.data]
+
+    def test_name_prefix_ranks_before_city_and_word_prefix(self):
+        self.assertEqual(
+            self.names(q="lon"), ["London Heathrow", "Gatwick"]
+        )
+        self.assertEqual(self.names(q="l"), ["London Heathrow", "Lviv",
+                                             "Gatwick"])
+        self.assertEqual(self.names(q="heath"), ["London Heathrow"])
+        self.assertEqual(self.names(q="new y"), ["John F. Kennedy"])
+
+    def test_misspelling_matches_by_similarity(self):
+        self.assertEqual(self.names(q="Gatwik"), ["Gatwick"])
+        self.assertEqual(self.names(q="xyz"), [])
+
+    def test_limit_and_new_airports(self):
+        self.assertEqual(len(self.names(q="l", limit=1)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_airport(name="Lisbon", closest_big_city="Lisbon")
+
+        self.assertIn("Lisbon", self.names(q="lis"))
+
+    def test_query_required(self):
+        res = self.client.get(AIRPORT_AUTOCOMPLETE_URL)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(AIRPORT_AUTOCOMPLETE_URL, {"q": "l", "limit": 0})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def sample_image(size=(2000, 1000), image_format="PNG"):
+    image_file = BytesIO()
+    Image.new("RGB", size, "navy").save(image_file, image_format)
+    return SimpleUploadedFile(
+        f"image.{image_format.lower()}",
+        image_file.getvalue(),
+        content_type=f"image/{image_format.lower()}",
+    )
+
+
+@override_settings(IMAGE_RENDITION_WORKERS=0)
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        cache.clear()
+        self.client = APIClient()
+        self.admin_user = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin_user)
+
+    def upload_airport(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                AIRPORTS_URL,
+                {"name": "Test Airport", "closest_big_city": "Test City",
+                 "image": sample_image()},
+                format="multipart",
+            )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Airport.objects.get(id=res.data["id"])
+
+    def test_renditions_listed_after_upload(self):
+        airport = self.upload_airport()
+
+        res = self.client.get(AIRPORTS_URL)
+
+        renditions = res.data[0]["image_renditions"]
+        self.assertEqual(set(renditions), set(settings.IMAGE_RENDITIONS))
+        for label, edge in settings.IMAGE_RENDITIONS.items():
+            self.assertTrue(renditions[label]["webp"].startswith("http://"))
+            for extension in ("webp", "jpeg"):
+                path = airport.image_renditions[label][extension]
+                with default_storage.open(path) as rendition:
+                    self.assertEqual(Image.open(rendition).size,
+                                     (edge, edge // 2))
+
+    def test_renditions_of_replaced_image_hidden(self):
+        airport = self.upload_airport()
+        airport.image = "uploads/airports/other.png"
+        Airport.objects.filter(id=airport.id).update(image=airport.image)
+        cache.clear()
+
+        res = self.client.get(AIRPORTS_URL)
+
+        self.assertEqual(res.data[0]["image_renditions"], {})
+
+
 class FlightModelTests(TestCase):
     def test_flight_str(self):
         flight = sample_flight()
@@ -165,6 +310,16 @@ class TicketModelTests(TestCase):
         )
         self.assertEqual(str(ticket), f"Ticket for " f"Flight {self.flight} - Seat 1-1")
 
+    def test_only_taken_seat_reported_as_reserved(self):
+        Ticket.objects.create(row=1, seat=1, flight=self.flight, order=self.order)
+
+        with self.assertRaises(SeatReservedError):
+            Ticket.objects.create(
+                row=1, seat=1, flight=self.flight, order=self.order
+            )
+        with self.assertRaises(IntegrityError):
+            Ticket(row=1, seat=2, flight=self.flight, order_id=None).save()
+
     def test_validate_invalid_row(self):
         """Test that validation error is raised for invalid row number"""
         with self.assertRaises(ValidationError):
@@ -203,16 +358,105 @@ class OrderApiTests(TestCase):
         self.flight = sample_flight()
 
     def test_create_order_with_ticket(self):
-        payload = {"ticket": {"row": 1, "seat": 1, "flight": self.flight.id}}
-        res = self.client.post(ORDERS_URL, payload)
+        payload = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+        res = self.client.post(ORDERS_URL, payload, format="json")
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         order = Order.objects.get(id=res.data["id"])
         self.assertEqual(order.user, self.user)
         ticket = Ticket.objects.get(order=order)
-        self.assertEqual(ticket.row, payload["ticket"]["row"])
-        self.assertEqual(ticket.seat, payload["ticket"]["seat"])
+        self.assertEqual(ticket.row, payload["tickets"][0]["row"])
+        self.assertEqual(ticket.seat, payload["tickets"][0]["seat"])
         self.assertEqual(ticket.flight, self.flight)
 
+    def test_create_order_with_multiple_tickets(self):
+        other_flight = sample_flight()
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": self.flight.id},
+                {"row": 1, "seat": 2, "flight": self.flight.id},
+                {"row": 2, "seat": 1, "flight": other_flight.id},
+            ]
+        }
+        res = self.client.post(ORDERS_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Ticket.objects.filter(order_id=res.data["id"]).count(), 3)
+
+    def test_create_order_invalid_seat_reported_per_item(self):
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": self.flight.id},
+                {"row": 100, "seat": 1, "flight": self.flight.id},
+            ]
+        }
+        res = self.client.post(ORDERS_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertIn("row", res.data["tickets"][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_create_order_reserved_seat_conflict_rolls_back(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(row=1, seat=2, flight=self.flight, order=order)
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": self.flight.id},
+                {"row": 1, "seat": 2, "flight": self.flight.id},
+            ]
+        }
+        res = self.client.post(ORDERS_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertIn("seat", res.data["tickets"][1])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_update_order_replaces_tickets(self):
+        other_flight = sample_flight()
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(row=1, seat=1, flight=self.flight, order=order)
+        url = reverse("airport:order-detail", args=[order.id])
+
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "flight": self.flight.id},
+                {"row": 2, "seat": 3, "flight": other_flight.id},
+            ]
+        }
+        res = self.client.put(url, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(order.tickets.values_list("flight_id", "row", "seat")),
+            {(self.flight.id, 1, 1), (other_flight.id, 2, 3)},
+        )
+
+        payload = {"tickets": [{"row": 3, "seat": 2, "flight": self.flight.id}]}
+        res = self.client.patch(url, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(order.tickets.values_list("flight_id", "row", "seat")),
+            [(self.flight.id, 3, 2)],
+        )
+
+        res = self.client.patch(url, {}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(order.tickets.count(), 1)
+
+    def test_update_order_reserved_seat_keeps_tickets(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(row=1, seat=1, flight=self.flight, order=order)
+        other = Order.objects.create(user=self.user)
+        Ticket.objects.create(row=1, seat=2, flight=self.flight, order=other)
+
+        res = self.client.put(
+            reverse("airport:order-detail", args=[order.id]),
+            {"tickets": [{"row": 1, "seat": 2, "flight": self.flight.id}]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            list(order.tickets.values_list("row", "seat")), [(1, 1)]
+        )
+
     def test_list_user_orders(self):
         other_user = get_user_model().objects.create_user("other@test.com", "testpass")
         Order.objects.create(user=other_user)
@@ -221,4 +465,1632 @@ class OrderApiTests(TestCase):
 
         res = self.client.get(ORDERS_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)  # Should only see own orders
+        self.assertEqual(len(res.data["results"]), 2)  # Should only see own orders
+
+
+def seats_url(flight_id):
+    return reverse("airport:flight-seats", args=[flight_id])
+
+
+class FlightSeatMapApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight(airplane=sample_airplane(rows=2, seats_in_row=6))
+        order = Order.objects.create(user=self.user)
+        for row, seat in ((1, 1), (1, 2), (2, 6)):
+            Ticket.objects.create(row=row, seat=seat, flight=self.flight, order=order)
+
+    def test_seat_map_bitmap(self):
+        res = self.client.get(seats_url(self.flight.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["encoding"], "bitmap")
+        self.assertEqual(res.data["tickets_taken"], 3)
+        # 12 seats -> 2 bytes: 1100 0000 0000 0100
+        self.assertEqual(base64.b64decode(res.data["taken"]), b"\xc0\x10")
+
+    def test_seat_map_row_runs(self):
+        res = self.client.get(seats_url(self.flight.id), {"encoding": "rle"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["taken"], {"1": [[1, 2]], "2": [[6, 1]]})
+
+    def test_seat_map_invalid_encoding(self):
+        res = self.client.get(seats_url(self.flight.id), {"encoding": "png"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FlightPaginationApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+
+    def test_flights_paginated_by_departure_time(self):
+        flights = [
+            sample_flight(
+                departure_time=timezone.now() + timedelta(days=days),
+                arrival_time=timezone.now() + timedelta(days=days, hours=2),
+            )
+            for days in (3, 1, 2)
+        ]
+
+        res = self.client.get(FLIGHTS_URL, {"page_size": 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [flight["id"] for flight in res.data["results"]],
+            [flights[1].id, flights[2].id],
+        )
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual(
+            [flight["id"] for flight in res.data["results"]], [flights[0].id]
+        )
+        self.assertIsNone(res.data["next"])
+
+
+class FlightFilterApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.kyiv = sample_airport(name="Kyiv")
+        self.lviv = sample_airport(name="Lviv")
+        self.odesa = sample_airport(name="Odesa")
+        self.departure = timezone.now().replace(
+            hour=12, minute=0, second=0, microsecond=0
+        ) + timedelta(days=2)
+        self.kyiv_lviv = sample_flight(
+            route=Route.objects.create(
+                source=self.kyiv, destination=self.lviv, distance=500
+            ),
+            departure_time=self.departure,
+            arrival_time=self.departure + timedelta(hours=1),
+        )
+        self.lviv_odesa = sample_flight(
+            route=Route.objects.create(
+                source=self.lviv, destination=self.odesa, distance=700
+            ),
+            departure_time=self.departure + timedelta(days=3),
+            arrival_time=self.departure + timedelta(days=3, hours=1),
+        )
+
+    def get_ids(self, params):
+        res = self.client.get(FLIGHTS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return {flight["id"] for flight in res.data["results"]}
+
+    def test_filter_by_airports(self):
+        self.assertEqual(self.get_ids({"source": self.kyiv.id}), {self.kyiv_lviv.id})
+        self.assertEqual(
+            self.get_ids({"destination": f"{self.lviv.id},{self.odesa.id}"}),
+            {self.kyiv_lviv.id, self.lviv_odesa.id},
+        )
+
+    def test_filter_by_airplane_type(self):
+        airplane_type = self.lviv_odesa.airplane.airplane_type
+        self.assertEqual(
+            self.get_ids({"airplane_type": airplane_type.id}), {self.lviv_odesa.id}
+        )
+
+    def test_filter_by_departure_window(self):
+        day = self.departure.date()
+        self.assertEqual(
+            self.get_ids({"departure_from": day, "departure_to": day}),
+            {self.kyiv_lviv.id},
+        )
+        self.assertEqual(
+            self.get_ids({"departure_from": day + timedelta(days=1)}),
+            {self.lviv_odesa.id},
+        )
+
+    def test_invalid_filter_value(self):
+        res = self.client.get(FLIGHTS_URL, {"source": "kyiv"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(FLIGHTS_URL, {"departure_from": "tomorrow"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FlightTicketsAvailableApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight(airplane=sample_airplane(rows=2, seats_in_row=3))
+        self.empty_flight = sample_flight()
+        order = Order.objects.create(user=self.user)
+        for seat in (1, 2):
+            Ticket.objects.create(row=1, seat=seat, flight=self.flight, order=order)
+
+    def test_tickets_available_in_list(self):
+        res = self.client.get(FLIGHTS_URL)
+
+        available = {
+            flight["id"]: flight["tickets_available"] for flight in res.data["results"]
+        }
+        self.assertEqual(available, {self.flight.id: 4, self.empty_flight.id: 180})
+
+    def test_ticket_and_order_flights_leave_it_out(self):
+        fields = {
+            "id", "route", "airplane", "departure_time", "arrival_time",
+            "crew",
+        }
+        for fast in (False, True):
+            with override_settings(FAST_LIST_SERIALIZATION=fast):
+                tickets = self.client.get(TICKETS_URL).data["results"]
+            self.assertEqual(set(tickets[0]["flight"]), fields)
+
+        orders = self.client.get(ORDERS_URL).data["results"]
+        self.assertEqual(set(orders[0]["tickets"][0]["flight"]), fields)
+
+    def test_tickets_counted_per_page_row(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(FLIGHTS_URL)
+
+        for query in context.captured_queries:
+            self.assertNotIn('JOIN "airport_ticket"', query["sql"])
+
+    def test_tickets_available_in_detail(self):
+        res = self.client.get(reverse("airport:flight-detail", args=[self.flight.id]))
+        self.assertEqual(res.data["tickets_available"], 4)
+
+
+def bulk_sample_flights(count):
+    route = sample_route()
+    airplane = sample_airplane(rows=count, seats_in_row=1)
+    crew = sample_crew()
+    departure = timezone.now() + timedelta(days=1)
+    flights = Flight.objects.bulk_create(
+        Flight(
+            route=route,
+            airplane=airplane,
+            departure_time=departure + timedelta(minutes=i),
+            arrival_time=departure + timedelta(minutes=i, hours=2),
+        )
+        for i in range(count)
+    )
+    Flight.crew.through.objects.bulk_create(
+        Flight.crew.through(flight=flight, crew=crew) for flight in flights
+    )
+    return flights
+
+
+class ListQueryCountTests(TestCase):
+    """List endpoints must not issue queries per returned row"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+
+    def sample_orders(self, count):
+        flights = bulk_sample_flights(count)
+        orders = Order.objects.bulk_create(
+            Order(user=self.user) for _ in range(count)
+        )
+        Ticket.objects.bulk_create(
+            Ticket(row=i + 1, seat=1, flight=flight, order=order)
+            for i, (flight, order) in enumerate(zip(flights, orders))
+        )
+
+    def assert_constant_queries(self, url, num_queries):
+        for count in (10, 1000):
+            with self.subTest(rows=count):
+                Order.objects.all().delete()
+                Flight.objects.all().delete()
+                self.sample_orders(count)
+                with self.assertNumQueries(num_queries):
+                    res = self.client.get(url, {"page_size": 100})
+                self.assertEqual(len(res.data["results"]), min(count, 100))
+
+    def test_flight_list_query_count(self):
+        # page ids and state for the ETag, then the page and crew prefetch
+        self.assert_constant_queries(FLIGHTS_URL, 4)
+
+    def test_ticket_list_query_count(self):
+        self.assert_constant_queries(TICKETS_URL, 2)
+
+    def test_order_list_query_count(self):
+        self.assert_constant_queries(ORDERS_URL, 3)
+
+
+class FastListSerializationTests(TestCase):
+    """The values() row path must render the same bytes as the list
+    serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        flights = [sample_flight() for _ in range(3)]
+        flights[0].crew.add(sample_crew(first_name="Anna"))
+        flights[1].crew.clear()
+        order = Order.objects.create(user=self.user)
+        for seat, flight in enumerate(flights, start=1):
+            Ticket.objects.create(row=1, seat=seat, flight=flight, order=order)
+
+    def pages(self, url, fast):
+        contents = []
+        params = {"page_size": 2}
+        with override_settings(FAST_LIST_SERIALIZATION=fast):
+            while url:
+                res = self.client.get(url, params)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                contents.append(res.content)
+                url, params = json.loads(res.content)["next"], None
+        return contents
+
+    def test_flight_list_identical(self):
+        slow = self.pages(FLIGHTS_URL, fast=False)
+
+        self.assertEqual(len(slow), 2)
+        self.assertEqual(self.pages(FLIGHTS_URL, fast=True), slow)
+
+    def test_ticket_list_identical(self):
+        slow = self.pages(TICKETS_URL, fast=False)
+
+        self.assertEqual(len(slow), 2)
+        self.assertEqual(self.pages(TICKETS_URL, fast=True), slow)
+
+    def test_filtered_flight_list_identical(self):
+        flight = Flight.objects.first()
+        params = {"source": flight.route.source_id}
+
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            slow = self.client.get(FLIGHTS_URL, params).content
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            fast = self.client.get(FLIGHTS_URL, params).content
+
+        self.assertEqual(fast, slow)
+        self.assertEqual(len(json.loads(fast)["results"]), 1)
+
+    @override_settings(FAST_LIST_SERIALIZATION=True)
+    def test_query_count(self):
+        # page ids and state for the ETag, then the page and crew names
+        with self.assertNumQueries(4):
+            self.client.get(FLIGHTS_URL)
+        with self.assertNumQueries(2):
+            self.client.get(TICKETS_URL)
+
+
+class ReferenceDataCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        sample_airport()
+        self.client.get(AIRPORTS_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(AIRPORTS_URL)
+        self.assertEqual(len(res.data), 1)
+
+    def test_cache_invalidated_on_save_and_delete(self):
+        airport = sample_airport()
+        self.client.get(AIRPORTS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_airport(name="Test Airport 2")
+        res = self.client.get(AIRPORTS_URL)
+        self.assertEqual(len(res.data), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            airport.delete()
+        res = self.client.get(AIRPORTS_URL)
+        self.assertEqual(len(res.data), 1)
+
+    def test_generation_bumped_after_commit(self):
+        versions = get_model_versions([Airport])
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                sample_airport()
+                self.assertEqual(get_model_versions([Airport]), versions)
+            self.assertEqual(get_model_versions([Airport]), versions)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_model_versions([Airport]), versions)
+
+    def test_related_model_change_invalidates_list(self):
+        route = sample_route()
+        self.client.get(reverse("airport:route-list"))
+
+        route.source.name = "Renamed Airport"
+        with self.captureOnCommitCallbacks(execute=True):
+            route.source.save()
+        res = self.client.get(reverse("airport:route-list"))
+        self.assertEqual(res.data[0]["source"], "Renamed Airport")
+
+    def test_query_string_is_part_of_key(self):
+        sample_airport()
+        self.client.get(AIRPORTS_URL)
+
+        with self.assertNumQueries(1):
+            self.client.get(AIRPORTS_URL, {"page": 2})
+
+
+def flight_detail_url(flight_id):
+    return reverse("airport:flight-detail", args=[flight_id])
+
+
+class FlightConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+    def test_detail_not_modified(self):
+        res = self.client.get(flight_detail_url(self.flight.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", res)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                flight_detail_url(self.flight.id), HTTP_IF_NONE_MATCH=res["ETag"]
+            )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_not_modified(self):
+        res = self.client.get(FLIGHTS_URL)
+        res = self.client.get(FLIGHTS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_when_flight_deleted(self):
+        other = sample_flight()
+        res = self.client.get(FLIGHTS_URL)
+        self.assertNotIn("Last-Modified", res)
+        etag = res["ETag"]
+
+        other.delete()
+        res = self.client.get(FLIGHTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_list_ignores_if_modified_since(self):
+        modified = self.client.get(flight_detail_url(self.flight.id))[
+            "Last-Modified"
+        ]
+
+        res = self.client.get(FLIGHTS_URL, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_depends_on_page_only(self):
+        later = sample_flight(
+            departure_time=timezone.now() + timedelta(days=5),
+            arrival_time=timezone.now() + timedelta(days=5, hours=2),
+        )
+        etag = self.client.get(FLIGHTS_URL, {"page_size": 1})["ETag"]
+
+        later.airplane.name = "Renamed Airplane"
+        later.airplane.save()
+        res = self.client.get(
+            FLIGHTS_URL, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag
+        )
+        # Still followed by a next page, nothing on this page changed
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_with_related_data(self):
+        etag = self.client.get(flight_detail_url(self.flight.id))["ETag"]
+
+        source = self.flight.route.source
+        source.name = "Renamed Airport"
+        source.save()
+        res = self.client.get(flight_detail_url(self.flight.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_etag_changes_when_ticket_booked(self):
+        etag = self.client.get(flight_detail_url(self.flight.id))["ETag"]
+
+        self.client.post(
+            ORDERS_URL,
+            {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]},
+            format="json",
+        )
+        res = self.client.get(flight_detail_url(self.flight.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_changes_when_crew_removed(self):
+        etag = self.client.get(flight_detail_url(self.flight.id))["ETag"]
+
+        self.flight.crew.clear()
+        res = self.client.get(flight_detail_url(self.flight.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["crew"], [])
+
+
+ASYNC_FLIGHTS_URL = reverse("airport:async-flight-list")
+
+
+class AsyncFlightApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.headers = {
+            "Authorization": f"Bearer {AccessToken.for_user(self.user)}"
+        }
+        self.flights = bulk_sample_flights(5)
+
+    async def get_json(self, url, data=None):
+        res = await self.async_client.get(url, data, headers=self.headers)
+        if res.streaming:
+            content = b"".join([chunk async for chunk in res.streaming_content])
+        else:
+            content = res.content
+        return res, json.loads(content)
+
+    async def test_detail_matches_sync_detail(self):
+        url = reverse("airport:async-flight-detail", args=[self.flights[0].id])
+        res = await self.async_client.get(url, headers=self.headers)
+        expected = await sync_to_async(self.client.get)(
+            flight_detail_url(self.flights[0].id)
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected.content)
+
+    async def test_list_pages_match_sync_list(self):
+        expected = await sync_to_async(self.client.get)(FLIGHTS_URL)
+
+        res, page = await self.get_json(ASYNC_FLIGHTS_URL, {"page_size": 3})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(page["results"]), 3)
+        res, next_page = await self.get_json(page["next"])
+
+        self.assertIsNone(next_page["next"])
+        self.assertEqual(
+            page["results"] + next_page["results"],
+            json.loads(expected.content)["results"],
+        )
+
+    async def test_list_filters(self):
+        _, page = await self.get_json(
+            ASYNC_FLIGHTS_URL, {"source": self.flights[0].route.source_id + 1}
+        )
+        self.assertEqual(page["results"], [])
+
+        res, errors = await self.get_json(ASYNC_FLIGHTS_URL, {"source": "x"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("source", errors)
+
+    async def test_authentication_required(self):
+        res = await self.async_client.get(ASYNC_FLIGHTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_detail_not_found(self):
+        res = await self.async_client.get(
+            reverse("airport:async-flight-detail", args=[0]),
+            headers=self.headers,
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_streamed_list_recorded_in_metrics(self):
+        registry.reset()
+        await self.get_json(ASYNC_FLIGHTS_URL)
+
+        body = (await self.async_client.get("/metrics")).content.decode()
+        # user lookup, flights and the crew prefetch
+        self.assertIn(
+            'airport_db_queries_total{view="airport:async-flight-list"} 3',
+            body,
+        )
+
+
+ITINERARIES_URL = reverse("airport:flight-itineraries")
+
+
+class ItinerarySearchApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.airplane = sample_airplane()
+        self.kyiv = sample_airport(name="Kyiv")
+        self.warsaw = sample_airport(name="Warsaw")
+        self.vienna = sample_airport(name="Vienna")
+        self.lisbon = sample_airport(name="Lisbon")
+        self.day = (timezone.now() + timedelta(days=2)).replace(
+            hour=6, minute=0, second=0, microsecond=0
+        )
+        self.routes = {
+            (source, destination): Route.objects.create(
+                source=source, destination=destination, distance=distance
+            )
+            for source, destination, distance in (
+                (self.kyiv, self.warsaw, 700),
+                (self.warsaw, self.lisbon, 2500),
+                (self.kyiv, self.vienna, 1000),
+                (self.vienna, self.lisbon, 2300),
+            )
+        }
+
+    def add_flight(self, source, destination, departure_hours, block_hours=2):
+        departure = self.day + timedelta(hours=departure_hours)
+        return Flight.objects.create(
+            route=self.routes[(source, destination)],
+            airplane=self.airplane,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=block_hours),
+        )
+
+    def search(self, **params):
+        params = {
+            "source": self.kyiv.id,
+            "destination": self.lisbon.id,
+            "departure_date": self.day.date(),
+            **params,
+        }
+        res = self.client.get(ITINERARIES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [[flight["id"] for flight in item["flights"]] for item in res.data]
+
+    def test_ranked_by_distance_and_duration(self):
+        to_warsaw = self.add_flight(self.kyiv, self.warsaw, 0)
+        to_lisbon_from_warsaw = self.add_flight(self.warsaw, self.lisbon, 10, 4)
+        to_vienna = self.add_flight(self.kyiv, self.vienna, 1)
+        to_lisbon_from_vienna = self.add_flight(self.vienna, self.lisbon, 4, 3)
+
+        self.assertEqual(
+            self.search(),
+            [
+                [to_warsaw.id, to_lisbon_from_warsaw.id],
+                [to_vienna.id, to_lisbon_from_vienna.id],
+            ],
+        )
+        self.assertEqual(
+            self.search(ordering="duration")[0],
+            [to_vienna.id, to_lisbon_from_vienna.id],
+        )
+
+    def test_minimum_connection_time_respected(self):
+        self.add_flight(self.kyiv, self.vienna, 0)
+        self.add_flight(self.vienna, self.lisbon, 2, 3)  # no time to connect
+        later = self.add_flight(self.vienna, self.lisbon, 5, 3)
+
+        self.assertEqual(self.search()[0][1], later.id)
+
+    def test_max_stops(self):
+        self.add_flight(self.kyiv, self.vienna, 0)
+        self.add_flight(self.vienna, self.lisbon, 5)
+
+        self.assertEqual(self.search(max_stops=0), [])
+
+    def test_route_graph_updated_on_route_change(self):
+        self.search()
+        direct = Route.objects.create(
+            source=self.kyiv, destination=self.lisbon, distance=3300
+        )
+        flight = Flight.objects.create(
+            route=direct,
+            airplane=self.airplane,
+            departure_time=self.day,
+            arrival_time=self.day + timedelta(hours=5),
+        )
+
+        self.assertEqual(self.search(max_stops=0), [[flight.id]])
+
+    def test_route_changes_leave_running_searches_alone(self):
+        self.search()
+        graph = route_graph.adjacency
+        edges = {source: dict(routes) for source, routes in graph.items()}
+
+        direct = Route.objects.create(
+            source=self.kyiv, destination=self.lisbon, distance=3300
+        )
+        removed = self.routes[(self.warsaw, self.lisbon)]
+        removed.delete()
+
+        # Searches iterating the old graph see it unchanged
+        self.assertEqual(graph, edges)
+        self.assertIn(direct.id, route_graph.adjacency[self.kyiv.id])
+        self.assertNotIn(removed.id, route_graph.adjacency[self.warsaw.id])
+
+    def test_route_graph_rebuilt_after_max_age(self):
+        self.add_flight(self.kyiv, self.vienna, 0)
+        self.add_flight(self.vienna, self.lisbon, 5)
+        self.assertEqual(len(self.search()), 1)
+
+        # Another process changing routes with a per-process cache
+        Route.objects.filter(destination=self.lisbon).update(
+            destination=self.warsaw
+        )
+        self.assertEqual(len(self.search()), 1)
+        with override_settings(ITINERARY_GRAPH_MAX_AGE=0):
+            self.assertEqual(self.search(), [])
+
+
+class TicketConflictApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin_user)
+        self.flight = sample_flight()
+        self.order = Order.objects.create(user=self.admin_user)
+
+    def test_reserved_seat_returns_conflict(self):
+        payload = {"row": 1, "seat": 1, "flight": self.flight.id, "order": self.order.id}
+        res = self.client.post(TICKETS_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.post(TICKETS_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+
+class ExportApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.admin_user = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin_user)
+        self.flight = sample_flight()
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(row=2, seat=1, flight=self.flight, order=self.order)
+        Ticket.objects.create(row=1, seat=3, flight=self.flight, order=self.order)
+
+    def export(self, url, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return res, b"".join(res.streaming_content).decode()
+
+    def test_ticket_export_csv(self):
+        res, content = self.export(reverse("airport:ticket-export"))
+
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="tickets.csv"', res["Content-Disposition"])
+        lines = content.splitlines()
+        self.assertEqual(
+            lines[0],
+            "id,order,ordered_at,user,flight,source,destination,"
+            "departure_time,row,seat",
+        )
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith(f"{Ticket.objects.first().id},"))
+        self.assertIn("test@test.com,", lines[1])
+
+    def test_manifest_ndjson(self):
+        _, content = self.export(
+            reverse("airport:flight-manifest", args=[self.flight.id]),
+            output="ndjson",
+        )
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(row["row"], row["seat"]) for row in rows], [(1, 3), (2, 1)]
+        )
+        self.assertEqual(rows[0]["passenger"], "test@test.com")
+        self.assertEqual(
+            rows[0]["ordered_at"], self.order.created_at.isoformat()
+        )
+
+    def test_order_export_only_own_orders(self):
+        Order.objects.create(user=self.admin_user)
+        self.client.force_authenticate(self.user)
+
+        _, content = self.export(
+            reverse("airport:order-export"), output="ndjson"
+        )
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.order.id)
+        self.assertEqual(rows[0]["tickets"], 2)
+
+    def test_ticket_export_admin_only(self):
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(reverse("airport:ticket-export"))
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_output_format(self):
+        res = self.client.get(reverse("airport:ticket-export"), {"output": "xml"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+FLIGHT_IMPORT_URL = reverse("airport:flight-import-schedule")
+
+
+class ScheduleImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin_user)
+        self.route = sample_route()
+        self.airplane = sample_airplane()
+        self.crew = sample_crew()
+        self.departure = (timezone.now() + timedelta(days=3)).replace(
+            second=0, microsecond=0
+        )
+
+    def timetable(self, *rows):
+        lines = ["source,destination,airplane,departure_time,arrival_time,crew"]
+        for departure, arrival, crew in rows:
+            lines.append(
+                f"{self.route.source.name},{self.route.destination.name},"
+                f"{self.airplane.name},{departure.isoformat()},"
+                f"{arrival.isoformat()},{crew}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def upload(self, content, encoding="utf-8"):
+        return self.client.post(
+            FLIGHT_IMPORT_URL,
+            {
+                "file": SimpleUploadedFile(
+                    "timetable.csv", content.encode(encoding)
+                )
+            },
+            format="multipart",
+        )
+
+    def test_import_creates_flights_with_crew(self):
+        content = self.timetable(
+            (self.departure, self.departure + timedelta(hours=2),
+             self.crew.full_name),
+            (self.departure + timedelta(days=1),
+             self.departure + timedelta(days=1, hours=2), ""),
+        )
+
+        res = self.upload(content)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {"created": 2, "skipped": 0})
+        flight = Flight.objects.get(departure_time=self.departure)
+        self.assertEqual(list(flight.crew.all()), [self.crew])
+
+        res = self.upload(content)
+        self.assertEqual(res.data, {"created": 0, "skipped": 2})
+        self.assertEqual(Flight.objects.count(), 2)
+
+    def test_invalid_rows_reported_and_nothing_created(self):
+        content = self.timetable(
+            (self.departure, self.departure + timedelta(hours=2), ""),
+            (self.departure, self.departure - timedelta(hours=2), ""),
+            (self.departure - timedelta(days=5),
+             self.departure + timedelta(hours=2), ""),
+            (self.departure, self.departure + timedelta(hours=2), "Nobody"),
+        )
+
+        res = self.upload(content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data["lines"],
+            {
+                3: ["Arrival time must be after departure time."],
+                4: ["Departure time cannot be in the past."],
+                5: ["Unknown crew member 'Nobody'"],
+            },
+        )
+        self.assertFalse(Flight.objects.exists())
+
+    def test_short_and_long_rows_reported(self):
+        content = self.timetable(
+            (self.departure, self.departure + timedelta(hours=2), "")
+        )
+        source, destination = (
+            self.route.source.name, self.route.destination.name
+        )
+        content += f"{source},{destination}\n"
+        content += f"{source},{destination},{self.airplane.name},,\n"
+        content += content.splitlines()[1] + ",extra\n"
+
+        res = self.upload(content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data["lines"],
+            {
+                3: ["Missing airplane"],
+                4: ["Missing departure_time"],
+                5: ["Too many cells"],
+            },
+        )
+        self.assertFalse(Flight.objects.exists())
+
+    def test_non_utf8_line_reported(self):
+        self.crew.first_name = "Zoë"
+        self.crew.save()
+        content = self.timetable(
+            (self.departure, self.departure + timedelta(hours=2), ""),
+            (self.departure + timedelta(days=1),
+             self.departure + timedelta(days=1, hours=2),
+             self.crew.full_name),
+        )
+
+        res = self.upload(content, encoding="latin-1")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["lines"], {3: ["Line is not UTF-8 text"]})
+        self.assertFalse(Flight.objects.exists())
+
+        res = self.upload("\ufeff" + content)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_import_admin_only(self):
+        user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(user)
+
+        res = self.upload(self.timetable())
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as csv_file:
+            csv_file.write(
+                self.timetable(
+                    (self.departure, self.departure + timedelta(hours=2), "")
+                )
+            )
+            csv_file.flush()
+            out = StringIO()
+            call_command("import_schedule", csv_file.name, stdout=out)
+
+        self.assertIn("Created 1 flights", out.getvalue())
+        self.assertEqual(Flight.objects.count(), 1)
+
+
+FLIGHT_SCHEDULES_URL = reverse("airport:flightschedule-list")
+MATERIALIZE_URL = reverse("airport:flightschedule-materialize")
+
+
+class FlightScheduleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin_user)
+        self.today = timezone.localdate()
+        self.schedule = FlightSchedule.objects.create(
+            route=sample_route(),
+            airplane=sample_airplane(),
+            days_of_week=0b1111111,
+            departure_time=time(23, 59),
+            block_time=timedelta(hours=2),
+            valid_from=self.today + timedelta(days=1),
+            valid_to=self.today + timedelta(days=30),
+        )
+
+    def test_create_schedule_with_weekdays(self):
+        payload = {
+            "route": self.schedule.route_id,
+            "airplane": self.schedule.airplane_id,
+            "days_of_week": [1, 3, 5],
+            "departure_time": "08:30",
+            "block_time": "01:45:00",
+            "valid_from": self.today.isoformat(),
+            "valid_to": (self.today + timedelta(days=7)).isoformat(),
+        }
+
+        res = self.client.post(FLIGHT_SCHEDULES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["days_of_week"], [1, 3, 5])
+        schedule = FlightSchedule.objects.get(pk=res.data["id"])
+        self.assertEqual(schedule.days_of_week, 0b10101)
+
+    def test_materialize_extends_horizon_incrementally(self):
+        res = self.client.post(
+            MATERIALIZE_URL,
+            {"until": (self.today + timedelta(days=10)).isoformat()},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, {"schedules": 1, "created": 10, "conflicts": []}
+        )
+        first = self.schedule.flights.order_by("departure_time").first()
+        self.assertEqual(
+            first.arrival_time - first.departure_time, timedelta(hours=2)
+        )
+        updated_at = first.updated_at
+
+        res = self.client.post(
+            MATERIALIZE_URL,
+            {"until": (self.today + timedelta(days=60)).isoformat()},
+        )
+
+        self.assertEqual(
+            res.data, {"schedules": 1, "created": 20, "conflicts": []}
+        )
+        self.assertEqual(self.schedule.flights.count(), 30)
+        first.refresh_from_db()
+        self.assertEqual(first.updated_at, updated_at)
+        self.schedule.refresh_from_db()
+        self.assertEqual(
+            self.schedule.materialized_until, self.schedule.valid_to
+        )
+
+        res = self.client.post(MATERIALIZE_URL)
+        self.assertEqual(
+            res.data, {"schedules": 0, "created": 0, "conflicts": []}
+        )
+
+    def test_materialize_skips_existing_flights(self):
+        departure = timezone.make_aware(
+            datetime.combine(
+                self.schedule.valid_from, self.schedule.departure_time
+            )
+        )
+        Flight.objects.create(
+            route=self.schedule.route,
+            airplane=self.schedule.airplane,
+            schedule=self.schedule,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=2),
+        )
+
+        res = self.client.post(
+            MATERIALIZE_URL,
+            {"until": (self.today + timedelta(days=3)).isoformat()},
+        )
+
+        self.assertEqual(res.data["created"], 2)
+        self.assertEqual(self.schedule.flights.count(), 3)
+
+    def test_materialize_only_weekdays(self):
+        self.schedule.days_of_week = 0b1
+        self.schedule.save()
+
+        res = self.client.post(
+            MATERIALIZE_URL,
+            {"until": (self.today + timedelta(days=14)).isoformat()},
+        )
+
+        self.assertEqual(res.data["created"], 2)
+        self.assertTrue(
+            all(
+                flight.departure_time.isoweekday() == 1
+                for flight in self.schedule.flights.all()
+            )
+        )
+
+    def test_materialize_admin_only(self):
+        user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(user)
+
+        res = self.client.post(MATERIALIZE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Flight.objects.exists())
+
+    def test_update_rebuilds_future_flights(self):
+        materialize_schedules(until=self.today + timedelta(days=10))
+        booked = self.schedule.flights.order_by("departure_time")[1]
+        Ticket.objects.create(
+            row=1,
+            seat=1,
+            flight=booked,
+            order=Order.objects.create(user=self.admin_user),
+        )
+
+        res = self.client.patch(
+            reverse("airport:flightschedule-detail", args=[self.schedule.id]),
+            {
+                "departure_time": "22:00",
+                "valid_to": (self.today + timedelta(days=5)).isoformat(),
+            },
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        flights = self.schedule.flights.order_by("departure_time")
+        self.assertIn(booked, flights)
+        rebuilt = flights.exclude(pk=booked.pk)
+        # The day of the sold flight keeps it and gets no second flight
+        self.assertEqual(rebuilt.count(), 4)
+        self.assertEqual(
+            {flight.departure_time.time() for flight in rebuilt}, {time(22)}
+        )
+        self.assertNotIn(
+            booked.departure_time.date(),
+            {flight.departure_time.date() for flight in rebuilt},
+        )
+        self.schedule.refresh_from_db()
+        self.assertEqual(
+            self.schedule.materialized_until, self.today + timedelta(days=5)
+        )
+
+    def test_materialize_leaves_out_busy_airplane(self):
+        departure = timezone.make_aware(
+            datetime.combine(
+                self.today + timedelta(days=2), self.schedule.departure_time
+            )
+        )
+        other = Flight.objects.create(
+            route=self.schedule.route,
+            airplane=self.schedule.airplane,
+            departure_time=departure - timedelta(hours=1),
+            arrival_time=departure + timedelta(hours=1),
+        )
+
+        res = self.client.post(
+            MATERIALIZE_URL,
+            {"until": (self.today + timedelta(days=3)).isoformat()},
+        )
+
+        self.assertEqual(res.data["created"], 2)
+        self.assertEqual(
+            res.data["conflicts"],
+            [
+                {
+                    "schedule": self.schedule.id,
+                    "departure_time": departure.isoformat().replace(
+                        "+00:00", "Z"
+                    ),
+                    "flights": [other.id],
+                }
+            ],
+        )
+        self.assertFalse(
+            self.schedule.flights.filter(departure_time=departure).exists()
+        )
+
+    def test_update_of_other_fields_keeps_flights(self):
+        materialize_schedules(until=self.today + timedelta(days=3))
+        flight_ids = set(self.schedule.flights.values_list("id", flat=True))
+
+        res = self.client.patch(
+            reverse("airport:flightschedule-detail", args=[self.schedule.id]),
+            {"valid_to": self.schedule.valid_to.isoformat()},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(self.schedule.flights.values_list("id", flat=True)),
+            flight_ids,
+        )
+
+    def test_materialize_command(self):
+        out = StringIO()
+        call_command(
+            "materialize_schedules",
+            until=(self.today + timedelta(days=5)).isoformat(),
+            stdout=out,
+        )
+
+        self.assertIn("Created 5 flights for 1 schedules", out.getvalue())
+
+
+FLIGHT_SEARCH_URL = reverse("airport:flightsearchrow-list")
+
+
+class FlightSearchRowTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+    def row(self):
+        return FlightSearchRow.objects.get(flight=self.flight)
+
+    def test_row_follows_flight_and_reference_data(self):
+        row = self.row()
+        self.assertEqual(row.source_name, "Source Airport")
+        self.assertEqual(row.capacity, 180)
+        self.assertEqual(row.tickets_sold, 0)
+
+        source = self.flight.route.source
+        source.name = "Renamed Airport"
+        source.save()
+        airplane = self.flight.airplane
+        airplane.rows = 10
+        airplane.save()
+        self.flight.arrival_time += timedelta(hours=1)
+        self.flight.save()
+
+        row = self.row()
+        self.assertEqual(row.source_name, "Renamed Airport")
+        self.assertEqual(row.capacity, 60)
+        self.assertEqual(row.arrival_time, self.flight.arrival_time)
+
+        self.flight.delete()
+        self.assertFalse(FlightSearchRow.objects.exists())
+
+    def test_ticket_writes_update_tickets_sold(self):
+        res = self.client.post(
+            ORDERS_URL,
+            {
+                "tickets": [
+                    {"row": 1, "seat": 1, "flight": self.flight.id},
+                    {"row": 1, "seat": 2, "flight": self.flight.id},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.row().tickets_sold, 2)
+
+        Ticket.objects.filter(flight=self.flight).first().delete()
+        self.assertEqual(self.row().tickets_sold, 1)
+
+    def test_order_delete_updates_flights_once(self):
+        other = sample_flight()
+        queries = []
+        for seats in (1, 6):
+            order = Order.objects.create(user=self.user)
+            Ticket.objects.bulk_create(
+                Ticket(row=2, seat=seat, flight=flight, order=order)
+                for seat in range(1, seats + 1)
+                for flight in (self.flight, other)
+            )
+            refresh_tickets_sold([self.flight.id])
+            self.assertEqual(self.row().tickets_sold, seats)
+            updated_at = Flight.objects.get(pk=other.pk).updated_at
+            with CaptureQueriesContext(connection) as context:
+                order.delete()
+            queries.append(len(context.captured_queries))
+
+            self.assertEqual(self.row().tickets_sold, 0)
+            self.assertGreater(
+                Flight.objects.get(pk=other.pk).updated_at, updated_at
+            )
+        self.assertEqual(queries[0], queries[1])
+
+    def test_search_matches_flight_list(self):
+        other = sample_flight(
+            route=Route.objects.create(
+                source=sample_airport(name="Other"),
+                destination=self.flight.route.destination,
+                distance=500,
+            ),
+            airplane=self.flight.airplane,
+        )
+
+        res = self.client.get(
+            FLIGHT_SEARCH_URL, {"source": other.route.source_id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["id"] for row in res.data["results"]],
+                         [other.id])
+        flight = self.client.get(
+            FLIGHTS_URL, {"source": other.route.source_id}
+        ).data["results"][0]
+        row = res.data["results"][0]
+        self.assertEqual(row["source"], flight["route"]["source"])
+        self.assertEqual(row["departure_time"], flight["departure_time"])
+        self.assertEqual(
+            row["tickets_available"], flight["tickets_available"]
+        )
+
+    def test_rebuild_repairs_drift(self):
+        FlightSearchRow.objects.update(source_name="Stale", tickets_sold=9)
+        second = sample_flight(
+            route=self.flight.route, airplane=self.flight.airplane
+        )
+        FlightSearchRow.objects.filter(flight=second).delete()
+
+        out = StringIO()
+        call_command("rebuild_search_rows", stdout=out)
+
+        self.assertIn("Checked 2 flights, repaired 2", out.getvalue())
+        self.assertEqual(self.row().source_name, "Source Airport")
+        self.assertEqual(self.row().tickets_sold, 0)
+        self.assertTrue(
+            FlightSearchRow.objects.filter(flight=second).exists()
+        )
+
+    def test_bulk_paths_create_rows(self):
+        call_command(
+            "seed_data", airports=5, flights=12, tickets_per_flight=3,
+            users=2, stdout=StringIO(),
+        )
+
+        self.assertEqual(
+            FlightSearchRow.objects.count(), Flight.objects.count()
+        )
+        out = StringIO()
+        call_command("rebuild_search_rows", stdout=out)
+        self.assertIn("repaired 0", out.getvalue())
+
+
+THROTTLED_RATES = {
+    **settings.REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {
+        "flights": "2/min", "tickets": "2/min", "token": "2/min"
+    },
+}
+
+
+@override_settings(REST_FRAMEWORK=THROTTLED_RATES)
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        throttling.reset_bucket_stores()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_flight_list_throttled_per_user(self):
+        flight = sample_flight()
+        for _ in range(2):
+            res = self.client.get(FLIGHTS_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(FLIGHTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "30")
+        res = self.client.get(reverse("airport:flight-detail",
+                                      args=[flight.id]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        other = get_user_model().objects.create_user(
+            "other@test.com", "testpass"
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(ASYNC_FLIGHTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_token_obtain_throttled_per_ip(self):
+        self.client.force_authenticate(None)
+        payload = {"email": "test@test.com", "password": "testpass"}
+        for _ in range(2):
+            res = self.client.post(reverse("user:token_obtain_pair"), payload)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(
+            reverse("user:token_obtain_pair"), payload,
+            REMOTE_ADDR="10.0.0.1",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.post(reverse("user:token_obtain_pair"), payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_bucket_refills_over_period(self):
+        store = throttling.LocalBucketStore()
+        self.assertEqual(store.take("key", 1.0, 2, 100.0), (True, 0))
+        self.assertEqual(store.take("key", 1.0, 2, 100.0), (True, 0))
+        self.assertEqual(store.take("key", 1.0, 2, 100.0), (False, 1.0))
+        self.assertEqual(store.take("key", 1.0, 2, 100.5), (False, 0.5))
+        self.assertEqual(store.take("key", 1.0, 2, 101.0), (True, 0))
+
+    def test_shared_memory_store_shared_between_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                THROTTLE_BUCKET_FILE=f"{directory}/buckets",
+                THROTTLE_BUCKET_SLOTS=64,
+            ):
+                first = throttling.SharedMemoryBucketStore()
+                second = throttling.SharedMemoryBucketStore()
+                self.assertTrue(first.take("key", 1.0, 2, 100.0)[0])
+                self.assertTrue(second.take("key", 1.0, 2, 100.0)[0])
+                self.assertFalse(first.take("key", 1.0, 2, 100.0)[0])
+                self.assertTrue(second.take("other", 1.0, 2, 100.0)[0])
+
+    def test_shared_memory_store_collisions_keep_tokens(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                THROTTLE_BUCKET_FILE=f"{directory}/buckets",
+                THROTTLE_BUCKET_SLOTS=4,
+            ):
+                store = throttling.SharedMemoryBucketStore()
+                keys = ["first", "second", "third", "fourth"]
+                for key in keys:
+                    self.assertTrue(store.take(key, 1.0, 1, 100.0)[0])
+                for key in keys:
+                    self.assertFalse(store.take(key, 1.0, 1, 100.0)[0])
+
+            with override_settings(
+                THROTTLE_BUCKET_FILE=f"{directory}/one",
+                THROTTLE_BUCKET_SLOTS=1,
+            ):
+                store = throttling.SharedMemoryBucketStore()
+                self.assertTrue(store.take("first", 1.0, 1, 100.0)[0])
+                self.assertFalse(store.take("second", 1.0, 1, 100.0)[0])
+                self.assertTrue(store.take("first", 1.0, 1, 101.0)[0])
+
+
+FLIGHT_CONFLICTS_URL = reverse("airport:flight-conflicts")
+
+
+class FlightDoubleBookingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin_user)
+        self.departure = timezone.now() + timedelta(days=1)
+        self.flight = sample_flight(
+            departure_time=self.departure,
+            arrival_time=self.departure + timedelta(hours=2),
+        )
+        self.crew = self.flight.crew.get()
+
+    def payload(self, start_hours, end_hours, airplane=None, crew=None):
+        return {
+            "route": self.flight.route_id,
+            "airplane": (airplane or self.flight.airplane).id,
+            "departure_time": self.departure + timedelta(hours=start_hours),
+            "arrival_time": self.departure + timedelta(hours=end_hours),
+            "crew": [(crew or sample_crew()).id],
+        }
+
+    def test_overlapping_airplane_rejected(self):
+        res = self.client.post(FLIGHTS_URL, self.payload(1, 3), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(self.flight.id), res.data["airplane"][0])
+        self.assertEqual(Flight.objects.count(), 1)
+
+    def test_overlapping_crew_rejected(self):
+        res = self.client.post(
+            FLIGHTS_URL,
+            self.payload(1, 3, airplane=sample_airplane(), crew=self.crew),
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("crew", res.data)
+        self.assertNotIn("airplane", res.data)
+
+    def test_back_to_back_flights_allowed(self):
+        res = self.client.post(
+            FLIGHTS_URL, self.payload(2, 4, crew=self.crew), format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_update_checks_new_times_and_crew(self):
+        other = sample_flight(
+            departure_time=self.departure + timedelta(hours=3),
+            arrival_time=self.departure + timedelta(hours=5),
+        )
+        url = flight_detail_url(other.id)
+
+        res = self.client.patch(url, {"crew": [self.crew.id]}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.patch(
+            url,
+            {"departure_time": self.departure + timedelta(hours=1)},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("crew", res.data)
+
+        res = self.client.patch(
+            url, {"arrival_time": self.departure + timedelta(hours=6)},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_inverted_times_rejected(self):
+        res = self.client.post(FLIGHTS_URL, self.payload(3, 1), format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(
+            flight_detail_url(self.flight.id),
+            {"departure_time": self.departure + timedelta(hours=3)},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.departure_time, self.departure)
+
+    def test_past_departure_rejected_on_create_only(self):
+        res = self.client.post(
+            FLIGHTS_URL, self.payload(-48, -46), format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        Flight.objects.filter(pk=self.flight.pk).update(
+            departure_time=self.departure - timedelta(days=2),
+            arrival_time=self.departure - timedelta(days=2, hours=-2),
+        )
+        res = self.client.patch(
+            flight_detail_url(self.flight.id),
+            {"arrival_time": self.departure - timedelta(days=2, hours=-3)},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_airplane_change_keeps_sold_seats(self):
+        order = Order.objects.create(user=self.admin_user)
+        Ticket.objects.create(row=20, seat=4, flight=self.flight, order=order)
+        url = flight_detail_url(self.flight.id)
+
+        res = self.client.patch(
+            url,
+            {"airplane": sample_airplane(rows=10, seats_in_row=6).id},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("airplane", res.data)
+
+        res = self.client.patch(
+            url,
+            {"airplane": sample_airplane(rows=20, seats_in_row=4).id},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_conflict_report(self):
+        # Bulk imports skip the per-flight check, the report finds them
+        overlapping = Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.flight.airplane,
+            departure_time=self.departure + timedelta(hours=1),
+            arrival_time=self.departure + timedelta(hours=4),
+        )
+        overlapping.crew.add(self.crew)
+        sample_flight(
+            departure_time=self.departure + timedelta(hours=1),
+            arrival_time=self.departure + timedelta(hours=4),
+        )
+
+        res = self.client.get(FLIGHT_CONFLICTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (row["resource"], row["resource_id"], row["flight"],
+                 row["conflicting_flight"])
+                for row in res.data
+            ],
+            [
+                ("airplane", self.flight.airplane_id, self.flight.id,
+                 overlapping.id),
+                ("crew", self.crew.id, self.flight.id, overlapping.id),
+            ],
+        )
+        self.assertEqual(
+            parse_datetime(res.data[0]["overlap_end"]),
+            self.departure + timedelta(hours=2),
+        )
+
+    def test_conflict_report_window(self):
+        Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.flight.airplane,
+            departure_time=self.departure + timedelta(hours=1),
+            arrival_time=self.departure + timedelta(hours=4),
+        )
+
+        res = self.client.get(
+            FLIGHT_CONFLICTS_URL,
+            {"end": (self.departure - timedelta(hours=1)).isoformat()},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_conflict_report_admin_only(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("user@test.com", "pass")
+        )
+
+        res = self.client.get(FLIGHT_CONFLICTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_find_conflicts_sweep(self):
+        start = self.departure
+        intervals = [
+            ("a", 1, start, start + timedelta(hours=5)),
+            ("a", 2, start + timedelta(hours=1), start + timedelta(hours=2)),
+            ("a", 3, start + timedelta(hours=2), start + timedelta(hours=3)),
+            ("b", 4, start + timedelta(hours=1), start + timedelta(hours=9)),
+        ]
+
+        self.assertEqual(
+            [pair[:3] for pair in find_conflicts(intervals)],
+            [("a", 1, 2), ("a", 1, 3)],
+        )
+
+
+class SeedDataCommandTests(TestCase):
+    def snapshot(self):
+        return sorted(
+            Ticket.objects.values_list(
+                "flight__route__source__name",
+                "flight__departure_time",
+                "row",
+                "seat",
+            )
+        )
+
+    def test_seed_data(self):
+        call_command(
+            "seed_data", airports=10, flights=30, tickets_per_flight=8,
+            users=5, seed=7, batch_size=10, stdout=StringIO(),
+        )
+
+        self.assertEqual(Flight.objects.count(), 30)
+        self.assertEqual(Ticket.objects.count(), 30 * 8)
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertFalse(
+            Ticket.objects.filter(
+                Q(row__gt=F("flight__airplane__rows"))
+                | Q(seat__gt=F("flight__airplane__seats_in_row"))
+            ).exists()
+        )
+
+    def test_seed_data_is_deterministic(self):
+        options = {"airports": 10, "flights": 20, "tickets_per_flight": 5,
+                   "users": 3, "seed": 3, "start": date(2030, 1, 1)}
+        call_command("seed_data", stdout=StringIO(), **options)
+        first = self.snapshot()
+
+        for model in (Airport, AirplaneType, Crew, get_user_model()):
+            model.objects.all().delete()
+        call_command("seed_data", stdout=StringIO(), **options)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_same_seed_refused(self):
+        options = {"airports": 3, "flights": 2, "tickets_per_flight": 1,
+                   "users": 2, "seed": 4}
+        call_command("seed_data", stdout=StringIO(), **options)
+
+        with self.assertRaisesMessage(CommandError, "Seed 4 is already"):
+            call_command("seed_data", stdout=StringIO(), **options)
+        self.assertEqual(Flight.objects.count(), 2)
+
+        call_command("seed_data", stdout=StringIO(), **{**options, "seed": 5})
+        self.assertEqual(Flight.objects.count(), 4)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+
+    def test_metrics_recorded_per_view(self):
+        bulk_sample_flights(3)
+        self.client.get(FLIGHTS_URL)
+        self.client.get(FLIGHTS_URL)
+
+        res = self.client.get("/metrics")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        body = res.content.decode()
+        self.assertIn(
+            'airport_http_requests_total{view="airport:flight-list",'
+            'method="GET",status="200"} 2',
+            body,
+        )
+        self.assertIn(
+            'airport_http_request_duration_seconds_count'
+            '{view="airport:flight-list"} 2',
+            body,
+        )
+        self.assertIn(
+            'airport_db_queries_total{view="airport:flight-list"} 8', body
+        )
+
+    def test_unresolved_paths_share_one_series(self):
+        self.client.get("/does-not-exist/")
+        self.client.get("/does-not-exist-either/")
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'airport_http_requests_total{view="<unresolved>",'
+            'method="GET",status="404"} 2',
+            body,
+        )
@@ -0,0 +1,132 @@
+"""
+Resized renditions of Airport and Airplane images.
+
+Uploads are resized in a pool of worker processes once the saving
+transaction commits. The request thread only submits the job. The paths
+of the renditions are then written to the image_renditions field. They
+are kept with the name of the image they were made from, so list
+responses never point to renditions of a replaced image.
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from airport.cache import bump_model_version
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_path(name, label, extension):
+    directory, filename = os.path.split(name)
+    stem, _ = os.path.splitext(filename)
+    return os.path.join(
+        directory, "renditions", f"{stem}-{label}.{extension}"
+    )
+
+
+def render_renditions(name):
+    """Write every IMAGE_RENDITIONS size of the image in every format and
+    return {"source": name, label: {format: path}}. Runs in a worker."""
+    with default_storage.open(name) as image_file:
+        image = ImageOps.exif_transpose(Image.open(image_file))
+        image.load()
+    has_alpha = image.mode in {"RGBA", "LA"} or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    renditions = {"source": name}
+    for label, edge in settings.IMAGE_RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)
+        renditions[label] = {}
+        for extension, image_format in FORMATS.items():
+            frame = resized.convert("RGB") if extension == "jpeg" else resized
+            output = io.BytesIO()
+            frame.save(output, image_format, quality=settings.IMAGE_QUALITY)
+            path = rendition_path(name, label, extension)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            renditions[label][extension] = default_storage.save(
+                path, ContentFile(output.getvalue())
+            )
+    return renditions
+
+
+def save_renditions(model, pk, renditions):
+    updated = model.objects.filter(
+        pk=pk, image=renditions["source"]
+    ).update(image_renditions=renditions)
+    if updated:
+        bump_model_version(model)
+
+
+def store_renditions(model, pk, future):
+    try:
+        renditions = future.result()
+    except Exception:
+        logger.exception(
+            "Could not render images of %s %s", model._meta.label, pk
+        )
+        return
+    close_old_connections()
+    try:
+        save_renditions(model, pk, renditions)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                settings.IMAGE_RENDITION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return _executor
+
+
+def schedule_renditions(instance):
+    """Render the renditions of instance.image in the worker pool, or
+    right away when IMAGE_RENDITION_WORKERS is 0"""
+    model, pk, name = type(instance), instance.pk, instance.image.name
+    if not settings.IMAGE_RENDITION_WORKERS:
+        save_renditions(model, pk, render_renditions(name))
+        return
+    future = get_executor().submit(render_renditions, name)
+    future.add_done_callback(partial(store_renditions, model, pk))
+
+
+def rendition_urls(instance, request=None):
+    """{label: {format: url}} of the renditions of the current image"""
+    renditions = instance.image_renditions or {}
+    if not instance.image or renditions.get("source") != instance.image.name:
+        return {}
+    urls = {}
+    for label, paths in renditions.items():
+        if label == "source":
+            continue
+        urls[label] = {}
+        for extension, path in paths.items():
+            url = default_storage.url(path)
+            urls[label][extension] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return urls
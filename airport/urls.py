@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework import routers
 
+from airport.async_views import flight_detail, flight_list
 from airport.views import (
     AirportViewSet,
     AirplaneViewSet,
@@ -8,6 +9,8 @@ from airport.views import (
     RouteViewSet,
     CrewViewSet,
     FlightViewSet,
+    FlightScheduleViewSet,
+    FlightSearchViewSet,
     OrderViewSet,
     TicketViewSet,
 )
@@ -20,9 +23,19 @@ router.register("airplanes_type", AirplaneTypeViewSet)
 router.register("routes", RouteViewSet)
 router.register("crews", CrewViewSet)
 router.register("flights", FlightViewSet)
+router.register("flight_schedules", FlightScheduleViewSet)
+router.register("flight_search", FlightSearchViewSet)
 router.register("orders", OrderViewSet)
 router.register("tickets", TicketViewSet)
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("async/flights/", flight_list, name="async-flight-list"),
+    path(
+        "async/flights/<int:pk>/",
+        flight_detail,
+        name="async-flight-detail",
+    ),
+    path("", include(router.urls)),
+]
 
 app_name = "airport"
@@ -1,8 +1,35 @@
-from rest_framework import viewsets, mixins
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from airport.autocomplete import search_airports
+from airport.cache import get_cached_list, list_cache_key, set_cached_list
+from airport.conditional import flight_page_validators, flight_validators
+from airport.conflicts import conflict_report
+from airport.exports import (
+    MANIFEST_COLUMNS,
+    ORDER_EXPORT_COLUMNS,
+    TICKET_EXPORT_COLUMNS,
+    export_response,
+)
+from airport.itineraries import search_itineraries
 from airport.models import (
     Airplane,
     AirplaneType,
@@ -10,12 +37,16 @@ from airport.models import (
     Route,
     Crew,
     Flight,
+    FlightSchedule,
+    FlightSearchRow,
     Order,
     Ticket,
 )
 from airport.serializers import (
     AirplaneSerializer,
     AirplaneTypeSerializer,
+    AirportAutocompleteQuerySerializer,
+    AirportAutocompleteSerializer,
     AirportSerializer,
     RouteSerializer,
     CrewSerializer,
@@ -24,13 +55,42 @@ from airport.serializers import (
     TicketSerializer,
     AirplaneListSerializer,
     RouteListSerializer,
+    FlightConflictQuerySerializer,
+    FlightConflictSerializer,
     FlightDetailSerializer,
     FlightListSerializer,
+    FlightScheduleSerializer,
+    FlightSearchRowSerializer,
+    ItinerarySearchSerializer,
+    ItinerarySerializer,
+    MaterializeResultSerializer,
+    MaterializeSchedulesSerializer,
     OrderListSerializer,
+    ScheduleImportResultSerializer,
     TicketListSerializer,
     AirportListSerializer,
 )
+from airport.pagination import (
+    FlightPagination,
+    FlightSearchPagination,
+    OrderPagination,
+    TicketPagination,
+)
 from airport.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport.row_serializers import flight_rows, ticket_rows
+from airport.schedule_import import import_schedule
+from airport.schedules import (
+    FLIGHT_FIELDS,
+    materialize_schedules,
+    rebuild_schedule_flights,
+)
+from airport.seat_map import (
+    build_row_runs,
+    build_seat_bitmap,
+    encode_seat_bitmap,
+)
+from airport_api.throttling import FlightListThrottle, TicketListThrottle
+from user.authentication import CachedUserJWTAuthentication
 
 
 class CreateListOperation(
@@ -39,9 +99,47 @@ class CreateListOperation(
     pass
 
 
-class AirplaneViewSet(CreateListOperation):
+class CachedListMixin:
+    """Serve list responses from the cache until one of cache_models changes"""
+
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(request, self.cache_models)
+        data = get_cached_list(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        set_cached_list(key, response.data)
+        return response
+
+
+class RowListMixin:
+    """Build list items from values() rows with row_serializer instead of
+    the list serializer when FAST_LIST_SERIALIZATION is on"""
+
+    row_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.row_serializer.values(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.row_serializer.to_representation(rows))
+        return self.get_paginated_response(
+            self.row_serializer.to_representation(page)
+        )
+
+
+class AirplaneViewSet(CachedListMixin, CreateListOperation):
     queryset = Airplane.objects.all()
     serializer_class = AirplaneSerializer
+    cache_models = (Airplane, AirplaneType)
     permission_classes = [
         IsAdminOrIfAuthenticatedReadOnly,
     ]
@@ -58,17 +156,19 @@ class AirplaneViewSet(CreateListOperation):
         return queryset
 
 
-class AirplaneTypeViewSet(CreateListOperation):
+class AirplaneTypeViewSet(CachedListMixin, CreateListOperation):
     queryset = AirplaneType.objects.all()
     serializer_class = AirplaneTypeSerializer
+    cache_models = (AirplaneType,)
     permission_classes = [
         IsAdminOrIfAuthenticatedReadOnly,
     ]
 
 
-class AirportViewSet(CreateListOperation):
+class AirportViewSet(CachedListMixin, CreateListOperation):
     queryset = Airport.objects.all()
     serializer_class = AirportSerializer
+    cache_models = (Airport,)
     permission_classes = [
         IsAdminOrIfAuthenticatedReadOnly,
     ]
@@ -78,10 +178,34 @@ class AirportViewSet(CreateListOperation):
             return AirportListSerializer
         return AirportSerializer
 
+    @extend_schema(
+        parameters=[AirportAutocompleteQuerySerializer],
+        responses=AirportAutocompleteSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], url_path="autocomplete")
+    def autocomplete(self, request):
+        """Best `limit` airports whose name or city starts with, contains
+        a word starting with, or is similar to `q`"""
+        search = AirportAutocompleteQuerySerializer(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        airports = search_airports(
+            search.validated_data["q"], search.validated_data["limit"]
+        )
+        return Response(
+            AirportAutocompleteSerializer(
+                [
+                    {"id": pk, "name": name, "closest_big_city": city}
+                    for pk, name, city in airports
+                ],
+                many=True,
+            ).data
+        )
 
-class RouteViewSet(CreateListOperation):
+
+class RouteViewSet(CachedListMixin, CreateListOperation):
     queryset = Route.objects.all()
     serializer_class = RouteSerializer
+    cache_models = (Route, Airport)
     permission_classes = [
         IsAdminOrIfAuthenticatedReadOnly,
     ]
@@ -98,22 +222,140 @@ class RouteViewSet(CreateListOperation):
         return queryset
 
 
-class CrewViewSet(CreateListOperation):
+class CrewViewSet(CachedListMixin, CreateListOperation):
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
+    cache_models = (Crew,)
     permission_classes = [
         IsAdminOrIfAuthenticatedReadOnly,
     ]
 
 
-class FlightViewSet(CreateListOperation,
-                    mixins.RetrieveModelMixin):  # noqa: E128
+FLIGHT_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        "source",
+        type={"type": "list", "items": {"type": "number"}},
+        description="Filter by source airport ids (ex. ?source=1,2)",
+    ),
+    OpenApiParameter(
+        "destination",
+        type={"type": "list", "items": {"type": "number"}},
+        description="Filter by destination airport ids "
+                    "(ex. ?destination=3)",
+    ),
+    OpenApiParameter(
+        "airplane_type",
+        type={"type": "list", "items": {"type": "number"}},
+        description="Filter by airplane type ids "
+                    "(ex. ?airplane_type=1)",
+    ),
+    OpenApiParameter(
+        "departure_from",
+        type=OpenApiTypes.DATE,
+        description="Departing on or after this date "
+                    "(ex. ?departure_from=2025-06-01)",
+    ),
+    OpenApiParameter(
+        "departure_to",
+        type=OpenApiTypes.DATE,
+        description="Departing on or before this date "
+                    "(ex. ?departure_to=2025-06-30)",
+    ),
+]
+
+
+class FlightFilterMixin:
+    """Flight search query parameters, applied through filter_lookups"""
+
+    filter_lookups = {
+        "source": "route__source_id",
+        "destination": "route__destination_id",
+        "airplane_type": "airplane__airplane_type_id",
+    }
+
+    @staticmethod
+    def _params_to_ints(name, query_string):
+        try:
+            return [int(str_id) for str_id in query_string.split(",")]
+        except ValueError:
+            raise ValidationError(
+                {name: "Expected a comma-separated list of ids"}
+            )
+
+    @staticmethod
+    def _param_to_day_start(name, query_string):
+        day = parse_date(query_string) if query_string else None
+        if day is None:
+            raise ValidationError({name: "Expected a date as YYYY-MM-DD"})
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    @classmethod
+    def filter_flights(cls, queryset, params):
+        """Filter by source/destination airports, airplane type and
+        departure window, using range bounds so the departure_time
+        indexes stay usable."""
+        source = params.get("source")
+        destination = params.get("destination")
+        airplane_type = params.get("airplane_type")
+        departure_from = params.get("departure_from")
+        departure_to = params.get("departure_to")
+        lookups = cls.filter_lookups
+
+        if source:
+            queryset = queryset.filter(
+                **{
+                    f"{lookups['source']}__in": cls._params_to_ints(
+                        "source", source
+                    )
+                }
+            )
+        if destination:
+            queryset = queryset.filter(
+                **{
+                    f"{lookups['destination']}__in": cls._params_to_ints(
+                        "destination", destination
+                    )
+                }
+            )
+        if airplane_type:
+            queryset = queryset.filter(
+                **{
+                    f"{lookups['airplane_type']}__in": cls._params_to_ints(
+                        "airplane_type", airplane_type
+                    )
+                }
+            )
+        if departure_from:
+            queryset = queryset.filter(
+                departure_time__gte=cls._param_to_day_start(
+                    "departure_from", departure_from
+                )
+            )
+        if departure_to:
+            queryset = queryset.filter(
+                departure_time__lt=cls._param_to_day_start(
+                    "departure_to", departure_to
+                ) + timedelta(days=1)
+            )
+        return queryset
+
+
+class FlightViewSet(FlightFilterMixin, RowListMixin, CreateListOperation,
+                    mixins.RetrieveModelMixin,
+                    mixins.UpdateModelMixin):  # noqa: E128
     queryset = Flight.objects.all()
     serializer_class = FlightSerializer
+    row_serializer = flight_rows
+    pagination_class = FlightPagination
     permission_classes = [
         IsAdminOrIfAuthenticatedReadOnly,
     ]
 
+    def get_throttles(self):
+        if self.action == "list":
+            return [FlightListThrottle()]
+        return super().get_throttles()
+
     def get_serializer_class(self):
         if self.action == "list":
             return FlightListSerializer
@@ -121,16 +363,286 @@ class FlightViewSet(CreateListOperation,
             return FlightDetailSerializer
         return FlightSerializer
 
+    @staticmethod
+    def annotate_tickets_available(queryset):
+        # A correlated count rather than a join and GROUP BY, so only the
+        # rows of the page are counted
+        tickets_sold = Subquery(
+            Ticket.objects.filter(flight=OuterRef("pk"))
+            .order_by()
+            .values("flight")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return queryset.annotate(
+            tickets_available=(
+                F("airplane__rows") * F("airplane__seats_in_row")
+                - Coalesce(tickets_sold, 0)
+            )
+        )
+
     def get_queryset(self):
         queryset = self.queryset
-        if self.action in {"list", "retrieve"}:
-            return queryset.prefetch_related()
+        if self.action in {"list", "retrieve", "itineraries"}:
+            queryset = queryset.select_related(
+                "route__source", "route__destination", "airplane"
+            ).prefetch_related(
+                Prefetch("crew", queryset=Crew.objects.order_by("id"))
+            )
+        if self.action == "list":
+            return self.annotate_tickets_available(
+                self.filter_flights(queryset, self.request.query_params)
+            )
+        if self.action in {"retrieve", "itineraries"}:
+            return self.annotate_tickets_available(queryset)
+        if self.action == "seats":
+            return queryset.select_related("airplane")
         return queryset
 
+    @extend_schema(parameters=FLIGHT_FILTER_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        validators = flight_page_validators(
+            request,
+            self.filter_flights(self.queryset, request.query_params),
+            self.pagination_class(),
+            self,
+        )
+        return self.conditional_get(
+            request, validators, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            queryset = self.queryset.filter(pk=kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_get(
+            request,
+            flight_validators(request, queryset),
+            super().retrieve,
+            *args,
+            **kwargs,
+        )
+
+    @staticmethod
+    def conditional_get(request, validators, view, *args, **kwargs):
+        """Answer If-None-Match/If-Modified-Since with 304 before
+        serializing, and tag fresh responses with ETag/Last-Modified"""
+        etag, last_modified = validators
+        response = None
+        if etag:
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if etag and response.status_code in {200, 304}:
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    @extend_schema(
+        parameters=[ItinerarySearchSerializer],
+        responses=ItinerarySerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], url_path="itineraries")
+    def itineraries(self, request):
+        """Journeys from source to destination with at most max_stops
+        connections, departing on departure_date (today by default)"""
+        search = ItinerarySearchSerializer(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        params = search.validated_data
+
+        day = params.get("departure_date") or timezone.localdate()
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        itineraries = search_itineraries(
+            source_id=params["source"],
+            destination_id=params["destination"],
+            departure_from=max(day_start, timezone.now()),
+            departure_to=day_start + timedelta(days=1),
+            max_stops=params["max_stops"],
+            ordering=params["ordering"],
+            limit=params["limit"],
+        )
+
+        flights = self.get_queryset().in_bulk(
+            {
+                flight_id
+                for itinerary in itineraries
+                for flight_id in itinerary["flight_ids"]
+            }
+        )
+        for itinerary in itineraries:
+            itinerary["flights"] = [
+                flights[flight_id]
+                for flight_id in itinerary.pop("flight_ids")
+            ]
+
+        serializer = ItinerarySerializer(
+            itineraries, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(detail=True, methods=["get"], url_path="seats")
+    def seats(self, request, pk=None):
+        """Taken seats as a packed bitmap or, with ?encoding=rle, row runs"""
+        encoding = request.query_params.get("encoding", "bitmap")
+        if encoding not in {"bitmap", "rle"}:
+            raise ValidationError(
+                {"encoding": "Encoding must be 'bitmap' or 'rle'"}
+            )
+
+        flight = self.get_object()
+        airplane = flight.airplane
+        taken = list(
+            Ticket.objects.filter(flight=flight).values_list("row", "seat")
+        )
+
+        if encoding == "rle":
+            seat_map = build_row_runs(taken)
+        else:
+            seat_map = encode_seat_bitmap(
+                build_seat_bitmap(
+                    airplane.rows, airplane.seats_in_row, taken
+                )
+            )
+
+        return Response(
+            {
+                "flight": flight.id,
+                "rows": airplane.rows,
+                "seats_in_row": airplane.seats_in_row,
+                "tickets_taken": len(taken),
+                "encoding": encoding,
+                "taken": seat_map,
+            }
+        )
+
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary"}},
+            }
+        },
+        responses={201: ScheduleImportResultSerializer},
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def import_schedule(self, request):
+        """Create flights from a timetable CSV uploaded as `file`"""
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "Upload a timetable CSV file"})
+        result = import_schedule(upload)
+        return Response(
+            ScheduleImportResultSerializer(result).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        parameters=[FlightConflictQuerySerializer],
+        responses=FlightConflictSerializer(many=True),
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="conflicts",
+        permission_classes=[IsAdminUser],
+    )
+    def conflicts(self, request):
+        """Airplanes and crew members booked on overlapping flights"""
+        query = FlightConflictQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        report = conflict_report(
+            start=query.validated_data.get("start", timezone.now()),
+            end=query.validated_data.get("end"),
+        )
+        return Response(FlightConflictSerializer(report, many=True).data)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="manifest",
+        permission_classes=[IsAdminUser],
+    )
+    def manifest(self, request, pk=None):
+        """Passengers of the flight by seat as CSV or NDJSON"""
+        flight = self.get_object()
+        return export_response(
+            request,
+            Ticket.objects.filter(flight=flight).order_by("row", "seat"),
+            MANIFEST_COLUMNS,
+            f"flight-{flight.id}-manifest",
+        )
+
+
+class FlightSearchViewSet(FlightFilterMixin, mixins.ListModelMixin,
+                          GenericViewSet):  # noqa: E128
+    """Flight search over the denormalized FlightSearchRow table, one
+    index scan with no joins"""
+
+    queryset = FlightSearchRow.objects.all()
+    serializer_class = FlightSearchRowSerializer
+    pagination_class = FlightSearchPagination
+    permission_classes = [
+        IsAdminOrIfAuthenticatedReadOnly,
+    ]
+    filter_lookups = {
+        "source": "source_id",
+        "destination": "destination_id",
+        "airplane_type": "airplane_type_id",
+    }
+
+    def get_queryset(self):
+        return self.filter_flights(self.queryset, self.request.query_params)
+
+    @extend_schema(parameters=FLIGHT_FILTER_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class FlightScheduleViewSet(viewsets.ModelViewSet):
+    queryset = FlightSchedule.objects.all()
+    serializer_class = FlightScheduleSerializer
+    permission_classes = [
+        IsAdminOrIfAuthenticatedReadOnly,
+    ]
+
+    def perform_update(self, serializer):
+        schedule = serializer.instance
+        before = [getattr(schedule, field) for field in FLIGHT_FIELDS]
+        with transaction.atomic():
+            schedule = serializer.save()
+            if [getattr(schedule, field) for field in FLIGHT_FIELDS] != before:
+                rebuild_schedule_flights(schedule)
+
+    @extend_schema(
+        request=MaterializeSchedulesSerializer,
+        responses=MaterializeResultSerializer,
+    )
+    @action(detail=False, methods=["post"], url_path="materialize")
+    def materialize(self, request):
+        """Create the flights of every schedule up to `until`. Days
+        already materialized are left alone."""
+        serializer = MaterializeSchedulesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = materialize_schedules(serializer.validated_data.get("until"))
+        return Response(MaterializeResultSerializer(result).data)
+
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = OrderPagination
+    # Orders are filtered and saved by the User instance
+    authentication_classes = [CachedUserJWTAuthentication]
     permission_classes = [
         IsAuthenticated,
     ]
@@ -141,19 +653,51 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderSerializer
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if self.action == "list":
-            return queryset.select_related()
+            return queryset.prefetch_related(
+                Prefetch(
+                    "tickets",
+                    queryset=Ticket.objects.select_related(
+                        "flight__route__source",
+                        "flight__route__destination",
+                        "flight__airplane",
+                    ),
+                ),
+                "tickets__flight__crew",
+            )
         return queryset
 
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """Orders of the user with their ticket count as CSV or NDJSON"""
+        return export_response(
+            request,
+            self.get_queryset().annotate(
+                ticket_count=Count("tickets")
+            ).order_by("id"),
+            ORDER_EXPORT_COLUMNS,
+            "orders",
+        )
+
 
-class TicketViewSet(CreateListOperation):
+class TicketViewSet(RowListMixin, CreateListOperation):
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
+    row_serializer = ticket_rows
+    pagination_class = TicketPagination
     permission_classes = [
         IsAdminOrIfAuthenticatedReadOnly,
     ]
 
+    def get_throttles(self):
+        if self.action == "list":
+            return [TicketListThrottle()]
+        return super().get_throttles()
+
     def get_serializer_class(self):
         if self.action == "list":
             return TicketListSerializer
@@ -162,5 +706,28 @@ class TicketViewSet(CreateListOperation):
     def get_queryset(self):
         queryset = self.queryset
         if self.action == "list":
-            return queryset.select_related()
+            return queryset.select_related(
+                "flight__route__source",
+                "flight__route__destination",
+                "flight__airplane",
+            ).prefetch_related(
+                Prefetch(
+                    "flight__crew", queryset=Crew.objects.order_by("id")
+                )
+            )
         return queryset
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        """Every ticket with its order and flight as CSV or NDJSON"""
+        return export_response(
+            request,
+            self.get_queryset().order_by("id"),
+            TICKET_EXPORT_COLUMNS,
+            "tickets",
+        )
@@ -0,0 +1,234 @@
+"""
+Process-local request metrics exposed in Prometheus text format.
+
+Every worker process keeps its own counters; Prometheus scrapes each one
+and aggregates them. Requests are labelled by their resolved URL name
+(e.g. ``airport:flight-list``) so the number of series stays bounded.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+UNRESOLVED_VIEW = "<unresolved>"
+
+
+class ViewMetrics:
+    __slots__ = (
+        "requests", "buckets", "latency_sum", "queries", "query_seconds"
+    )
+
+    def __init__(self):
+        self.requests = defaultdict(int)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewMetrics)
+
+    def record(self, view, method, status, latency, queries, query_seconds):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, latency)
+        with self.lock:
+            metrics = self.views[view]
+            metrics.requests[(method, status)] += 1
+            metrics.buckets[bucket] += 1
+            metrics.latency_sum += latency
+            metrics.queries += queries
+            metrics.query_seconds += query_seconds
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                "# HELP airport_http_requests_total Requests by view, "
+                "method and status.",
+                "# TYPE airport_http_requests_total counter",
+            ]
+            for view, metrics in views:
+                for (method, status), count in sorted(
+                    metrics.requests.items()
+                ):
+                    lines.append(
+                        f"airport_http_requests_total{{view=\"{view}\","
+                        f"method=\"{method}\",status=\"{status}\"}} {count}"
+                    )
+
+            lines += [
+                "# HELP airport_http_request_duration_seconds Request "
+                "latency by view.",
+                "# TYPE airport_http_request_duration_seconds histogram",
+            ]
+            for view, metrics in views:
+                cumulative = 0
+                for bound, count in zip(
+                    (*LATENCY_BUCKETS, "+Inf"), metrics.buckets
+                ):
+                    cumulative += count
+                    lines.append(
+                        f"airport_http_request_duration_seconds_bucket"
+                        f"{{view=\"{view}\",le=\"{bound}\"}} {cumulative}"
+                    )
+                lines.append(
+                    f"airport_http_request_duration_seconds_sum"
+                    f"{{view=\"{view}\"}} {metrics.latency_sum}"
+                )
+                lines.append(
+                    f"airport_http_request_duration_seconds_count"
+                    f"{{view=\"{view}\"}} {cumulative}"
+                )
+
+            lines += [
+                "# HELP airport_db_queries_total SQL queries by view.",
+                "# TYPE airport_db_queries_total counter",
+            ]
+            lines += [
+                f"airport_db_queries_total{{view=\"{view}\"}} "
+                f"{metrics.queries}"
+                for view, metrics in views
+            ]
+            lines += [
+                "# HELP airport_db_query_duration_seconds_total Time spent "
+                "in SQL by view.",
+                "# TYPE airport_db_query_duration_seconds_total counter",
+            ]
+            lines += [
+                f"airport_db_query_duration_seconds_total{{view=\"{view}\"}} "
+                f"{metrics.query_seconds}"
+                for view, metrics in views
+            ]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class QueryCounter:
+    """SQL queries and their time for the request being handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Context variables follow a request into sync_to_async() threads, where
+# the async ORM runs its queries, so one wrapper installed on every
+# connection covers both the WSGI and the ASGI paths.
+current_counter = ContextVar("current_counter", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.seconds += time.perf_counter() - started
+        counter.queries += 1
+
+
+def install_query_counter(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+connection_created.connect(install_query_counter)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter, started = self.start()
+        response = self.get_response(request)
+        return self.finish(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter, started = self.start()
+        response = await self.get_response(request)
+        return self.finish(request, response, counter, started)
+
+    @staticmethod
+    def start():
+        counter = QueryCounter()
+        current_counter.set(counter)
+        return counter, time.perf_counter()
+
+    @staticmethod
+    def finish(request, response, counter, started):
+        match = request.resolver_match
+
+        def record():
+            registry.record(
+                match.view_name if match else UNRESOLVED_VIEW,
+                request.method,
+                response.status_code,
+                time.perf_counter() - started,
+                counter.queries,
+                counter.seconds,
+            )
+
+        if not response.streaming:
+            record()
+        elif response.is_async:
+            response.streaming_content = record_after_async(
+                response.streaming_content, record
+            )
+        else:
+            response.streaming_content = record_after(
+                response.streaming_content, record
+            )
+        return response
+
+
+def record_after(content, record):
+    """Streaming bodies are timed until their last chunk is sent"""
+    try:
+        yield from content
+    finally:
+        record()
+
+
+async def record_after_async(content, record):
+    try:
+        async for chunk in content:
+            yield chunk
+    finally:
+        record()
+
+
+def metrics_view(request):
+    return HttpResponse(
+        registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
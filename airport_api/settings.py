@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "user",
     "airport",
     "rest_framework",
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "airport_api.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -90,6 +93,77 @@ DATABASES = {
     }
 }
 
+# How requests get their database connection:
+# "none" (connect and close per request), "persistent" (keep the
+# connection for POSTGRES_CONN_MAX_AGE seconds and check it before reuse)
+# or "pool" (psycopg 3 connection pool, use it under ASGI)
+POSTGRES_CONNECTIONS = os.environ.get("POSTGRES_CONNECTIONS", "persistent")
+
+if POSTGRES_CONNECTIONS == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = int(
+        os.environ.get("POSTGRES_CONN_MAX_AGE", 60)
+    )
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+elif POSTGRES_CONNECTIONS == "pool":
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 10)),
+            "timeout": int(os.environ.get("POSTGRES_POOL_TIMEOUT", 10)),
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "airport-api"),
+    }
+}
+
+# Reference data list responses are invalidated by model signals,
+# the timeout only bounds how long unused entries are kept.
+REFERENCE_DATA_CACHE_TIMEOUT = int(
+    os.environ.get("REFERENCE_DATA_CACHE_TIMEOUT", 60 * 60)
+)
+
+# PostgreSQL advisory lock taken on each seat while an order books it:
+# "none" (rely on the unique constraint only), "wait" or "skip_locked"
+SEAT_BOOKING_LOCK = os.environ.get("SEAT_BOOKING_LOCK", "none")
+
+# Itinerary search over the in-memory route graph
+ITINERARY_MAX_STOPS = 3
+ITINERARY_MAX_PATHS = 50
+ITINERARY_MIN_CONNECTION = timedelta(minutes=45)
+ITINERARY_MAX_CONNECTION = timedelta(hours=24)
+# Route changes made by other processes reach the graph through the Route
+# cache generation, which needs a shared CACHE_BACKEND. With the default
+# per-process cache they show up after at most this many seconds.
+ITINERARY_GRAPH_MAX_AGE = int(os.environ.get("ITINERARY_GRAPH_MAX_AGE", 300))
+
+# Longest edge in pixels of the WebP/JPEG renditions made of uploaded
+# airport and airplane images, by a pool of IMAGE_RENDITION_WORKERS
+# processes (0 renders in the saving thread)
+IMAGE_RENDITIONS = {"small": 160, "medium": 480, "large": 1080}
+IMAGE_QUALITY = 80
+IMAGE_RENDITION_WORKERS = int(os.environ.get("IMAGE_RENDITION_WORKERS", 2))
+
+# Build the flight and ticket list items from values() rows instead of
+# the list serializers. Same JSON, less CPU per row.
+FAST_LIST_SERIALIZATION = (
+    os.environ.get("FAST_LIST_SERIALIZATION", "false").lower() == "true"
+)
+
+# Days ahead for which flights of recurring schedules are created when no
+# other horizon is given
+SCHEDULE_HORIZON_DAYS = 90
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,11 +215,28 @@ AUTH_USER_MODEL = "user.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.StatelessJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Token buckets of airport_api.throttling, per user or client IP
+    "DEFAULT_THROTTLE_RATES": {
+        "flights": os.environ.get("THROTTLE_RATE_FLIGHTS", "120/min"),
+        "tickets": os.environ.get("THROTTLE_RATE_TICKETS", "60/min"),
+        "token": os.environ.get("THROTTLE_RATE_TOKEN", "10/min"),
+    },
 }
 
+# LocalBucketStore keeps buckets per process. SharedMemoryBucketStore
+# shares them between the workers of a host through THROTTLE_BUCKET_FILE.
+THROTTLE_BUCKET_STORE = os.environ.get(
+    "THROTTLE_BUCKET_STORE", "airport_api.throttling.LocalBucketStore"
+)
+THROTTLE_BUCKET_FILE = os.environ.get(
+    "THROTTLE_BUCKET_FILE",
+    os.path.join(tempfile.gettempdir(), "airport-api-throttle"),
+)
+THROTTLE_BUCKET_SLOTS = int(os.environ.get("THROTTLE_BUCKET_SLOTS", 65536))
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Airport Service API",
     "DESCRIPTION": "Order airport tickets",
@@ -159,6 +250,11 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# Users loaded by user.authentication.CachedUserJWTAuthentication are
+# reused by this process for this many seconds
+AUTH_USER_CACHE_TIMEOUT = 60
+AUTH_USER_CACHE_SIZE = 10000
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=10),
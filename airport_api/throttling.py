@@ -0,0 +1,190 @@
+"""
+Token-bucket throttling per user, or per client IP when anonymous.
+
+A scope's rate in DEFAULT_THROTTLE_RATES, e.g. "120/min", is both the
+bucket size and how many tokens are added back, evenly, over the
+period. Requests spend one token each. Buckets live in the store named
+by THROTTLE_BUCKET_STORE. LocalBucketStore is a dict in each process.
+SharedMemoryBucketStore is a memory-mapped table shared by every worker
+on the host. Both take O(1) per request and never touch the database.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows, only LocalBucketStore is available
+    fcntl = None
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# Key hash, tokens left, time of the last update
+BUCKET = struct.Struct("<Qdd")
+# Slots a key of SharedMemoryBucketStore may occupy
+BUCKET_PROBES = 4
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """(requests, seconds) of a DRF rate string such as "120/min" """
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+def take_token(tokens, updated, now, rate, capacity):
+    """(allowed, tokens left, seconds until the next token)"""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) / rate
+
+
+class LocalBucketStore:
+    """Buckets of this process, least recently used dropped first"""
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, capacity, now):
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            allowed, tokens, wait = take_token(
+                tokens, updated, now, rate, capacity
+            )
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > settings.THROTTLE_BUCKET_SLOTS:
+                self.buckets.popitem(last=False)
+        return allowed, wait
+
+
+class SharedMemoryBucketStore:
+    """Fixed table of THROTTLE_BUCKET_SLOTS buckets in the memory-mapped
+    THROTTLE_BUCKET_FILE, shared by the workers of one host.
+
+    A key hashes to a window of BUCKET_PROBES slots, locked with fcntl
+    for the update. It takes the slot holding its bucket or an empty
+    one. When all are held by other keys, it takes over the least
+    recently updated slot with the tokens left in it, so a collision
+    never hands out a full bucket.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Map the table once per process, after any fork"""
+        if self.pid == os.getpid():
+            return
+        size = settings.THROTTLE_BUCKET_SLOTS * BUCKET.size
+        fd = os.open(settings.THROTTLE_BUCKET_FILE, os.O_RDWR | os.O_CREAT,
+                     0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self.fd, self.map, self.slots = (
+            fd, mmap.mmap(fd, size), settings.THROTTLE_BUCKET_SLOTS
+        )
+        self.probes = min(BUCKET_PROBES, self.slots)
+        self.pid = os.getpid()
+
+    def find_slot(self, digest, start, capacity, now):
+        """(offset, tokens, updated) of the bucket of digest in the
+        window of slots at start"""
+        oldest = None
+        for slot in range(start, start + self.probes):
+            offset = slot * BUCKET.size
+            stored, tokens, updated = BUCKET.unpack_from(self.map, offset)
+            if stored == digest:
+                return offset, tokens, updated
+            if not stored:
+                return offset, capacity, now
+            if oldest is None or updated < oldest[2]:
+                oldest = offset, min(tokens, capacity), updated
+        return oldest
+
+    def take(self, key, rate, capacity, now):
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+        ) or 1
+        # fcntl locks exclude other processes, the thread lock the
+        # threads of this one
+        with self.lock:
+            self.open()
+            start = digest % (self.slots - self.probes + 1)
+            window = (self.probes * BUCKET.size, start * BUCKET.size)
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, *window)
+            try:
+                offset, tokens, updated = self.find_slot(
+                    digest, start, capacity, now
+                )
+                allowed, tokens, wait = take_token(
+                    tokens, updated, now, rate, capacity
+                )
+                BUCKET.pack_into(self.map, offset, digest, tokens, now)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, *window)
+        return allowed, wait
+
+
+def get_bucket_store():
+    path = settings.THROTTLE_BUCKET_STORE
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = import_string(path)()
+        return _stores[path]
+
+
+def reset_bucket_stores():
+    """Forget the buckets of this process, e.g. between tests"""
+    with _stores_lock:
+        _stores.clear()
+
+
+class UserOrIPBucketThrottle(BaseThrottle):
+    """Token bucket of `scope` per user id, or per client IP"""
+
+    scope = None
+
+    def get_key(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return f"throttle:{self.scope}:user:{user.pk}"
+        return f"throttle:{self.scope}:ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if rate is None:
+            return True
+        capacity, seconds = parse_rate(rate)
+        allowed, self.wait_seconds = get_bucket_store().take(
+            self.get_key(request), capacity / seconds, capacity, time.time()
+        )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class FlightListThrottle(UserOrIPBucketThrottle):
+    scope = "flights"
+
+
+class TicketListThrottle(UserOrIPBucketThrottle):
+    scope = "tickets"
+
+
+class TokenObtainThrottle(UserOrIPBucketThrottle):
+    scope = "token"
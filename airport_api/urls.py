@@ -8,6 +8,8 @@ from drf_spectacular.views import (
     SpectacularRedocView,
 )
 
+from airport_api.metrics import metrics_view
+
 urlpatterns = [
     path(
         "admin/",
@@ -42,4 +44,9 @@ urlpatterns = [
         SpectacularRedocView.as_view(url_name="schema"),
         name="redoc",
     ),
+    path(
+        "metrics",
+        metrics_view,
+        name="metrics"
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
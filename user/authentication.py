@@ -0,0 +1,140 @@
+"""
+JWT authentication without a user query per request.
+
+Access tokens issued by ClaimsTokenObtainPairSerializer carry the email
+and is_staff of the user. For reads by non-staff users
+StatelessJWTAuthentication trusts them and returns a ClaimsUser, which
+is enough for the permission classes. Writes, staff tokens and views
+that filter or save by user read the User from a per-process cache
+(CachedUserJWTAuthentication). Entries expire after
+AUTH_USER_CACHE_TIMEOUT seconds and are cleared for a user when that
+user is saved or deleted in this process.
+
+Deactivating, deleting or demoting a user therefore stops their writes
+and staff access within AUTH_USER_CACHE_TIMEOUT seconds. Their tokens
+keep read access to the endpoints open to any user until they expire.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+)
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+USER_CLAIMS = ("email", "is_staff")
+
+
+class UserCache:
+    """Least recently used users by id, each kept for
+    AUTH_USER_CACHE_TIMEOUT seconds"""
+
+    def __init__(self):
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        """A copy of the user, or None if there is no such user"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry and entry[0] > now:
+                self.users.move_to_end(user_id)
+                return copy.copy(entry[1])
+
+        user = get_user_model().objects.filter(pk=user_id).first()
+        expires = now + settings.AUTH_USER_CACHE_TIMEOUT
+        with self.lock:
+            self.users[user_id] = (expires, user)
+            self.users.move_to_end(user_id)
+            while len(self.users) > settings.AUTH_USER_CACHE_SIZE:
+                self.users.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+user_cache = UserCache()
+
+
+class ClaimsUser(TokenUser):
+    """Request user built from the claims of the access token"""
+
+    def __str__(self):
+        return self.email
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @cached_property
+    def username(self):
+        return self.email
+
+
+class CachedUserJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reading users from the per-process user cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                "Token contained no recognizable user identification"
+            )
+
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(
+                "User not found", code="user_not_found"
+            )
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(
+                "User is inactive", code="user_inactive"
+            )
+        return user
+
+
+class StatelessJWTAuthentication(CachedUserJWTAuthentication):
+    """Trust the user claims of the token on reads by non-staff users and
+    make no query. Other requests, and tokens issued without the claims,
+    use the user cache."""
+
+    safe_request = False
+
+    def authenticate(self, request):
+        self.safe_request = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if (
+            self.safe_request
+            and all(claim in validated_token for claim in USER_CLAIMS)
+            and not validated_token["is_staff"]
+        ):
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
+
+
+class CachedUserJWTScheme(SimpleJWTScheme):
+    """Document both classes as the same bearer JWT scheme"""
+
+    target_class = "user.authentication.CachedUserJWTAuthentication"
+    match_subclasses = True
@@ -1,12 +1,20 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport_api.throttling import reset_bucket_stores
+from user.authentication import user_cache
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token_obtain_pair")
 ME_URL = reverse("user:manage")
+FLIGHTS_URL = reverse("airport:flight-list")
+AIRPORTS_URL = reverse("airport:airport-list")
 
 
 def create_user(**params):
@@ -46,6 +54,7 @@ class PublicUserApiTests(TestCase):
     """Test the users API (public)"""
 
     def setUp(self):
+        reset_bucket_stores()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -160,3 +169,105 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.email, payload["email"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class StatelessJwtAuthenticationTests(TestCase):
+    """Test authentication from token claims and the user cache"""
+
+    def setUp(self):
+        user_cache.clear()
+        reset_bucket_stores()
+        self.user = create_user(
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+
+    def authenticate(self, email="test@example.com"):
+        res = self.client.post(
+            TOKEN_URL, {"email": email, "password": "testpass123"}
+        )
+        token = res.data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return token
+
+    def user_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(path)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        table = get_user_model()._meta.db_table
+        return [
+            query for query in context.captured_queries
+            if table in query["sql"]
+        ]
+
+    def test_token_carries_user_claims(self):
+        token = AccessToken(self.authenticate())
+
+        self.assertEqual(token["email"], self.user.email)
+        self.assertIs(token["is_staff"], False)
+
+    def test_read_only_requests_make_no_user_query(self):
+        self.authenticate()
+
+        self.assertEqual(self.user_queries(FLIGHTS_URL), [])
+        self.assertEqual(self.user_queries(AIRPORTS_URL), [])
+
+    def test_staff_claim_grants_admin_access(self):
+        payload = {"name": "Test Airport", "closest_big_city": "Test City"}
+        self.authenticate()
+        res = self.client.post(AIRPORTS_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        get_user_model().objects.create_superuser(
+            "admin@example.com", "testpass123"
+        )
+        self.authenticate("admin@example.com")
+        res = self.client.post(AIRPORTS_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_writes_check_the_user(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(FLIGHTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.post(AIRPORTS_URL, {"name": "Test Airport"})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_token_checks_the_user(self):
+        admin = get_user_model().objects.create_superuser(
+            "admin@example.com", "testpass123"
+        )
+        self.authenticate("admin@example.com")
+        self.assertEqual(len(self.user_queries(FLIGHTS_URL)), 1)
+
+        admin.is_staff = False
+        admin.save()
+        res = self.client.post(
+            AIRPORTS_URL,
+            {"name": "Test Airport", "closest_big_city": "Test City"},
+        )
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_full_user_read_from_cache(self):
+        self.authenticate()
+
+        self.assertEqual(len(self.user_queries(ME_URL)), 1)
+        self.assertEqual(self.user_queries(ME_URL), [])
+
+        self.user.first_name = "Changed"
+        self.user.save()
+        self.assertEqual(len(self.user_queries(ME_URL)), 1)
+
+    def test_token_without_claims_uses_user_cache(self):
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(len(self.user_queries(FLIGHTS_URL)), 1)
+        self.assertEqual(self.user_queries(FLIGHTS_URL), [])
+
+        self.user.delete()
+        res = self.client.get(FLIGHTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -5,13 +5,22 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
+from airport_api.throttling import TokenObtainThrottle
+from user.serializers import ClaimsTokenObtainPairSerializer
 from user.views import CreateUserView, ManageUserView
 
 app_name = "user"
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path(
+        "token/",
+        TokenObtainPairView.as_view(
+            serializer_class=ClaimsTokenObtainPairSerializer,
+            throttle_classes=[TokenObtainThrottle],
+        ),
+        name="token_obtain_pair",
+    ),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     path("me/", ManageUserView.as_view(), name="manage"),